@@ -14,11 +14,19 @@ from torn_bot.config import (
     FACTION_LEADERBOARD_CHANNEL_ID,
     DAILY_LEADERBOARD_HOUR,
     DAILY_LEADERBOARD_MINUTE,
+    LEADERBOARD_SYNC_INTERVAL_S,
+    METRICS_HOST,
+    METRICS_PORT,
 )
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import close_db
+from torn_bot.api.key_pool import KEY_POOL
+from torn_bot.api.metrics import start_metrics_server
+from torn_bot.api.rate_limit import request_priority, PRIORITY_DAILY
 from torn_bot.commands import setup_all_commands
 from torn_bot.commands.faction_leaderboard_daily import build_faction_leaderboard_daily_message
-from torn_bot.services.faction_leaderboard_store import sync_faction_attacks
+from torn_bot.services.factions import sync_all_factions, faction_key_for
+from torn_bot.services.backfill import start_backfills
 from torn_bot.services.flight_watch import run_flight_watch_loop
 
 def main():
@@ -29,7 +37,7 @@ def main():
     client = discord.Client(intents=intents)
     tree = app_commands.CommandTree(client)
 
-    storage = KeyStorage()
+    storage = AsyncKeyStorage()
     setup_all_commands(tree, storage)
 
     def log(msg: str) -> None:
@@ -51,20 +59,27 @@ def main():
         now = datetime.now(tz=LONDON)
         if (now.hour, now.minute) < (DAILY_LEADERBOARD_HOUR, DAILY_LEADERBOARD_MINUTE):
             return
-        api_key = storage.get_global_key("faction")
-        if not api_key:
+        try:
+            picked = await faction_key_for(storage)
+        except Exception as e:
+            log(f"daily leaderboard skipped: faction lookup failed: {e}")
+            return
+        if not picked:
             log("daily leaderboard skipped: no global faction API key")
             return
+        faction_id, api_key = picked
         channel = await get_leaderboard_channel()
         if channel is None:
             log("daily leaderboard skipped: channel not accessible")
             return
         try:
-            msg = await build_faction_leaderboard_daily_message(
-                api_key,
-                include_backfill_status=False,
-                include_no_attacks_line=False,
-            )
+            with request_priority(PRIORITY_DAILY):
+                msg = await build_faction_leaderboard_daily_message(
+                    faction_id,
+                    api_key,
+                    include_backfill_status=False,
+                    include_no_attacks_line=False,
+                )
         except Exception as e:
             log(f"daily leaderboard failed: {e}")
             return
@@ -96,39 +111,54 @@ def main():
                 return
             await maybe_post_daily_leaderboard()
 
-    @tasks.loop(hours=1)
+    @tasks.loop(seconds=LEADERBOARD_SYNC_INTERVAL_S)
     async def leaderboard_sync_task():
         start = datetime.now(tz=LONDON)
-        api_key = storage.get_global_key("faction")
-        if not api_key:
-            log("leaderboard sync skipped: no global faction API key")
-            return
         try:
-            result = await sync_faction_attacks(api_key)
-            added = result.get("added")
+            with request_priority(PRIORITY_DAILY):
+                results = await sync_all_factions(storage)
+        except Exception as e:
             duration = (datetime.now(tz=LONDON) - start).total_seconds()
+            log(f"leaderboard sync failed: {e} duration_s={duration:.2f}")
+            return
+        if not results:
+            log("leaderboard sync skipped: no global faction API key")
+            return
+        start_backfills([r["faction_id"] for r in results], storage)
+        duration = (datetime.now(tz=LONDON) - start).total_seconds()
+        for result in results:
+            faction_id = result.get("faction_id")
+            if result.get("error"):
+                log(f"leaderboard sync failed: faction={faction_id} {result['error']} duration_s={duration:.2f}")
+                continue
             log(
                 "leaderboard sync ok: "
-                f"added={added} duration_s={duration:.2f}"
+                f"faction={faction_id} added={result.get('added')} updated={result.get('updated')} "
+                f"skipped={result.get('skipped')} duration_s={duration:.2f}"
             )
-        except Exception as e:
-            duration = (datetime.now(tz=LONDON) - start).total_seconds()
-            log(f"leaderboard sync failed: {e} duration_s={duration:.2f}")
 
     daily_task = None
     flight_task = None
+    metrics_runner = None
 
     @client.event
     async def on_ready():
-        nonlocal daily_task, flight_task
+        nonlocal daily_task, flight_task, metrics_runner
         await tree.sync()
+        await KEY_POOL.load(storage)
+        if METRICS_PORT and metrics_runner is None:
+            try:
+                metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+                log(f"metrics listening on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+            except Exception as e:
+                log(f"metrics server failed to start: {e}")
         if not leaderboard_sync_task.is_running():
             leaderboard_sync_task.start()
         if daily_task is None or daily_task.done():
             daily_task = client.loop.create_task(run_daily_leaderboard())
         if flight_task is None or flight_task.done():
             flight_task = client.loop.create_task(run_flight_watch_loop(client, storage))
-        api_key = storage.get_global_key("faction")
+        api_key = await storage.get_global_key("faction")
         if not api_key:
             log("startup check: no global faction API key set")
         if FACTION_LEADERBOARD_CHANNEL_ID:
@@ -145,7 +175,10 @@ def main():
             f"channel_id={FACTION_LEADERBOARD_CHANNEL_ID}"
         )
 
-    client.run(DISCORD_TOKEN)
+    try:
+        client.run(DISCORD_TOKEN)
+    finally:
+        close_db()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse
+
+from torn_bot.config import API_CACHE_MAX_ENTRIES, API_CACHE_PERSIST
+from torn_bot.db import transaction, run_db
+from torn_bot.utils.lru import LRUCache
+
+
+# seconds a response stays fresh, v1 rules are "endpoint:selection" and
+# v2 rules are "v2:path" with ids stripped. a request with several
+# selections uses the shortest ttl, anything unlisted is never cached
+_TTL_RULES: Dict[str, int] = {
+    "torn:*": 6 * 60 * 60,
+    "user:basic": 60,
+    "user:profile": 15,
+    "user:medals": 60 * 60,
+    "user:personalstats": 5 * 60,
+    "faction:basic": 5 * 60,
+    "faction:members": 60,
+    "v2:faction/members": 60,
+    "v2:user/basic": 5,
+}
+
+# only slow moving data is worth a disk write
+_PERSIST_MIN_TTL = 10 * 60
+
+
+def _rule_names(url: str, params: Optional[Dict[str, Any]]) -> list[str]:
+    segs = [p for p in urlparse(url).path.split("/") if p and not p.isdigit()]
+    if not segs:
+        return []
+    if segs[0] == "v2":
+        return ["v2:" + "/".join(segs[1:])]
+    endpoint = segs[0]
+    selections = str((params or {}).get("selections", "") or "")
+    return [f"{endpoint}:{s.strip()}" for s in selections.split(",")]
+
+
+def ttl_for(url: str, params: Optional[Dict[str, Any]]) -> int:
+    names = _rule_names(url, params)
+    if not names:
+        return 0
+    ttls = []
+    for name in names:
+        ttl = _TTL_RULES.get(name)
+        if ttl is None:
+            ttl = _TTL_RULES.get(name.split(":", 1)[0] + ":*")
+        if not ttl:
+            return 0
+        ttls.append(ttl)
+    return min(ttls)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, persist: bool):
+        self.memory = LRUCache(max_entries)
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._purged = False
+
+    @staticmethod
+    def _disk_key(req_id: tuple) -> str:
+        return hashlib.sha256(repr(req_id).encode()).hexdigest()
+
+    def _disk_get(self, req_id: tuple) -> Optional[tuple[dict, float]]:
+        with transaction() as conn:
+            if not self._purged:
+                conn.execute("DELETE FROM api_cache WHERE expires_at <= ?", (time.time(),))
+                self._purged = True
+            cur = conn.execute(
+                "SELECT body, expires_at FROM api_cache WHERE cache_key = ?",
+                (self._disk_key(req_id),),
+            )
+            row = cur.fetchone()
+        if not row or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), float(row[1])
+
+    def _disk_set(self, req_id: tuple, data: dict, expires_at: float) -> None:
+        with transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO api_cache (cache_key, body, expires_at) VALUES (?, ?, ?)",
+                (self._disk_key(req_id), json.dumps(data, separators=(",", ":")), expires_at),
+            )
+
+    async def get(self, req_id: tuple, ttl: int) -> Optional[dict]:
+        data = self.memory.get(req_id)
+        if data is not None:
+            self.hits += 1
+            return data
+        if self.persist and ttl >= _PERSIST_MIN_TTL:
+            item = await run_db(self._disk_get, req_id)
+            if item is not None:
+                data, expires_at = item
+                self.memory.set_until(req_id, data, expires_at)
+                self.hits += 1
+                self.disk_hits += 1
+                return data
+        self.misses += 1
+        return None
+
+    async def set(self, req_id: tuple, data: dict, ttl: int) -> None:
+        expires_at = time.time() + ttl
+        self.memory.set_until(req_id, data, expires_at)
+        if self.persist and ttl >= _PERSIST_MIN_TTL:
+            await run_db(self._disk_set, req_id, data, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "size": len(self.memory),
+            "max_size": self.memory.max_size,
+            "evictions": self.memory.evictions,
+        }
+
+
+RESPONSE_CACHE = ResponseCache(API_CACHE_MAX_ENTRIES, bool(API_CACHE_PERSIST))
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from torn_bot.api.cache import RESPONSE_CACHE, ttl_for
+from torn_bot.api.errors import TornAPIError
+from torn_bot.api.key_pool import KEY_POOL, KEY_ERROR_CODES
+from torn_bot.api.metrics import record_request, record_retry, record_queue_wait
+from torn_bot.api.rate_limit import Lane, get_bucket, current_priority
+from torn_bot.api.resilience import call_with_retries
+
+
+_HTTP_SESSION: aiohttp.ClientSession | None = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None or _HTTP_SESSION.closed:
+        _HTTP_SESSION = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=20)
+        )
+    return _HTTP_SESSION
+
+
+# request in flight and the lane it queues in, raised when a caller from
+# a busier lane joins it
+_INFLIGHT: Dict[tuple, Tuple[asyncio.Future, Lane]] = {}
+
+# stands in for the key in a pooled request's identity, the key itself is
+# only picked when the request is actually sent
+_POOLED = "<pool>"
+
+
+def _request_id(url: str, api_key: str, params: Optional[Dict[str, Any]]) -> tuple:
+    items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return url, api_key, items
+
+
+def endpoint_label(url: str) -> str:
+    """
+    "v1:user", "v2:user/basic", "v2:faction/attacksfull" - ids dropped so
+    every player's lookup shares one label
+
+    """
+    segs = [p for p in urlparse(url).path.split("/") if p and not p.isdigit()]
+    if segs and segs[0] == "v2":
+        return "v2:" + "/".join(segs[1:])
+    return "v1:" + (segs[0] if segs else "")
+
+
+def _retry_after(resp: aiohttp.ClientResponse) -> Optional[float]:
+    try:
+        return float(resp.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+async def _send_once(url: str, api_key: str, params: Optional[Dict[str, Any]], lane: Lane) -> dict:
+    q = dict(params or {})
+    q["key"] = api_key
+    endpoint = endpoint_label(url)
+
+    queued_at = time.monotonic()
+    await get_bucket(api_key).acquire(lane)
+    record_queue_wait(lane.priority, time.monotonic() - queued_at)
+
+    session = await get_session()
+    started = time.monotonic()
+    try:
+        async with session.get(url, params=q) as resp:
+            if resp.status == 429 or resp.status >= 500:
+                record_request(
+                    endpoint, status="http_error", code=resp.status,
+                    latency_s=time.monotonic() - started, api_key=api_key,
+                )
+                raise TornAPIError(resp.status, f"http {resp.status}", retry_after=_retry_after(resp))
+            try:
+                data = await resp.json()
+            except ValueError as e:
+                record_request(
+                    endpoint, status="bad_response", code=resp.status,
+                    latency_s=time.monotonic() - started, api_key=api_key,
+                )
+                raise TornAPIError(0, f"invalid response body: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        record_request(
+            endpoint, status="network_error", code=0,
+            latency_s=time.monotonic() - started, api_key=api_key,
+        )
+        raise TornAPIError(0, f"request failed: {e or type(e).__name__}")
+    latency_s = time.monotonic() - started
+
+    if isinstance(data, dict) and "error" in data:
+        err = data["error"]
+        code = int(err.get("code", 0) or 0)
+        record_request(endpoint, status="api_error", code=code, latency_s=latency_s, api_key=api_key)
+        KEY_POOL.report_error(api_key, code)
+        raise TornAPIError(code, err.get("error", "Unknown error"))
+
+    record_request(endpoint, status="ok", code=0, latency_s=latency_s, api_key=api_key)
+    return data
+
+
+async def _send(url: str, api_key: str, params: Optional[Dict[str, Any]], lane: Lane, pooled: bool = False) -> dict:
+    endpoint = endpoint_label(url)
+    attempts = 0
+
+    async def once() -> dict:
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            record_retry(endpoint)
+        if not pooled:
+            return await _send_once(url, api_key, params, lane)
+        # a pooled retry can move to whichever key has budget by then. a
+        # key that turns out invalid or paused is out of the pool after
+        # its error, so the same read goes to the next one straight away
+        tried: set = set()
+        while True:
+            key = KEY_POOL.pick(fallback=api_key)
+            tried.add(key)
+            try:
+                return await _send_once(url, key, params, lane)
+            except TornAPIError as e:
+                if e.code not in KEY_ERROR_CODES or KEY_POOL.pick(fallback=api_key) in tried:
+                    raise
+
+    return await call_with_retries(endpoint, once)
+
+
+async def _send_and_cache(
+    req_id: tuple,
+    url: str,
+    api_key: str,
+    params: Optional[Dict[str, Any]],
+    ttl: int,
+    lane: Lane,
+    pooled: bool,
+) -> dict:
+    data = await _send(url, api_key, params, lane, pooled)
+    if ttl:
+        await RESPONSE_CACHE.set(req_id, data, ttl)
+    return data
+
+
+def _forget(req_id: tuple, fut: asyncio.Future) -> None:
+    if _INFLIGHT.get(req_id, (None,))[0] is fut:
+        _INFLIGHT.pop(req_id, None)
+    if not fut.cancelled():
+        fut.exception()
+
+
+async def request_json(
+    url: str,
+    *,
+    api_key: str,
+    params: Optional[Dict[str, Any]] = None,
+    pooled: bool = False,
+) -> dict:
+    """
+    single GET against torn, waits for a token from the key's bucket first
+    so v1 and v2 callers share one budget per key. transient failures are
+    retried per api.resilience, permanent torn errors raise straight away
+
+    responses for endpoints listed in api.cache are served from the cache
+    while fresh, identical requests (url, key, params) already in flight
+    are joined rather than sent again, still queued ones move up to the
+    joining caller's lane. every caller gets the same response object so
+    treat it as read only
+
+    pooled requests are reads that don't depend on whose key sends them.
+    api_key is only the fallback, the key comes from KEY_POOL at send time
+    and is left out of the cache and in flight identity so every caller
+    shares them
+
+    """
+    req_id = _request_id(url, _POOLED if pooled else api_key, params)
+    ttl = ttl_for(url, params)
+    if ttl:
+        cached = await RESPONSE_CACHE.get(req_id, ttl)
+        if cached is not None:
+            return cached
+
+    inflight = _INFLIGHT.get(req_id)
+    if inflight is None:
+        lane = Lane()
+        fut = asyncio.ensure_future(_send_and_cache(req_id, url, api_key, params, ttl, lane, pooled))
+        _INFLIGHT[req_id] = (fut, lane)
+        fut.add_done_callback(lambda f: _forget(req_id, f))
+    else:
+        fut, lane = inflight
+        lane.raise_to(current_priority())
+    return await asyncio.shield(fut)
+
+
+async def close_session() -> None:
+    global _HTTP_SESSION
+    if _HTTP_SESSION and not _HTTP_SESSION.closed:
+        await _HTTP_SESSION.close()
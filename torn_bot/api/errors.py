@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from typing import Optional
+
+
+class TornAPIError(Exception):
+    def __init__(self, code: int, message: str, *, retry_after: Optional[float] = None):
+        self.code = code
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(f"Torn API Error {code}: {message}")
+
+
+class CircuitOpenError(TornAPIError):
+    def __init__(self, endpoint: str, wait_s: float):
+        super().__init__(0, f"torn api degraded, {endpoint} paused for {wait_s:.0f}s")
+        self.endpoint = endpoint
+        self.wait_s = wait_s
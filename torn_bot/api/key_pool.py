@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, Optional
+
+from torn_bot.api.rate_limit import get_bucket
+
+
+# torn error codes that are about the key, not the request. another key
+# can still answer the same read
+KEY_ERROR_CODES = {2, 13, 18}
+# 2 incorrect key -> out for good, that key string won't start working
+# 13 key owner inactive, 18 key paused -> retried after a while, the owner
+# can come back or unpause. 5 too many requests -> short cooldown
+_DISABLE_CODES = {2}
+_COOLDOWN_CODES = {5: 60, 13: 30 * 60, 18: 30 * 60}
+
+
+class KeyPool:
+    """
+    opt-in user keys shared for non-faction reads, picks whichever healthy
+    key has the most budget left in its bucket
+
+    """
+
+    def __init__(self):
+        self.keys: Dict[int, str] = {}
+        self._unhealthy: Dict[str, float] = {}
+
+    async def load(self, storage) -> None:
+        """
+        reloads enrolled keys. health is kept across reloads, they happen on
+        every /setapi and pool join, only keys that left the pool forget it
+
+        """
+        old = set(self.keys.values())
+        self.keys = dict(await storage.get_pool_keys())
+        for api_key in old - set(self.keys.values()):
+            self._unhealthy.pop(api_key, None)
+
+    def is_healthy(self, api_key: str) -> bool:
+        until = self._unhealthy.get(api_key)
+        if until is None:
+            return True
+        if time.time() >= until:
+            self._unhealthy.pop(api_key, None)
+            return True
+        return False
+
+    def report_error(self, api_key: str, code: int) -> None:
+        if code in _DISABLE_CODES:
+            self._unhealthy[api_key] = float("inf")
+        elif code in _COOLDOWN_CODES:
+            self._unhealthy[api_key] = time.time() + _COOLDOWN_CODES[code]
+
+    def pick(self, fallback: Optional[str] = None) -> Optional[str]:
+        candidates = [k for k in self.keys.values() if self.is_healthy(k)]
+        if fallback and fallback not in candidates and self.is_healthy(fallback):
+            candidates.append(fallback)
+        if not candidates:
+            return fallback
+        return max(candidates, key=lambda k: get_bucket(k).remaining())
+
+    def status(self) -> Dict[str, int]:
+        healthy = sum(1 for k in self.keys.values() if self.is_healthy(k))
+        return {"enrolled": len(self.keys), "healthy": healthy}
+
+
+KEY_POOL = KeyPool()
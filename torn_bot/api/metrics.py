@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, Iterable, Tuple
+
+from aiohttp import web
+
+from torn_bot.api.cache import RESPONSE_CACHE
+from torn_bot.api.rate_limit import iter_buckets
+from torn_bot.api.resilience import iter_breakers
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def key_slot(api_key: str) -> str:
+    """short stable label for a key, never the key itself"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:8]
+
+
+def _labels(**kwargs: object) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in kwargs.items()))
+
+
+def _fmt_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in items)
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = _labels(**labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, val in sorted(self.values.items()):
+            out.append(f"{self.name}{_fmt_labels(labels)} {val:g}")
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = _labels(**labels)
+        s = self.series.get(key)
+        if s is None:
+            # bucket counts, then sum and count
+            s = [0] * len(self.buckets) + [0.0, 0]
+            self.series[key] = s
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                s[i] += 1
+        s[-2] += value
+        s[-1] += 1
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, s in sorted(self.series.items()):
+            for i, bound in enumerate(self.buckets):
+                out.append(f"{self.name}_bucket{_fmt_labels(labels, [('le', f'{bound:g}')])} {s[i]}")
+            out.append(f"{self.name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {s[-1]}")
+            out.append(f"{self.name}_sum{_fmt_labels(labels)} {s[-2]:.6f}")
+            out.append(f"{self.name}_count{_fmt_labels(labels)} {s[-1]}")
+        return out
+
+
+REQUESTS = Counter(
+    "torn_api_requests_total",
+    "Torn API responses by endpoint, outcome, torn error code and key slot.",
+)
+RETRIES = Counter("torn_api_retries_total", "Torn API retries by endpoint.")
+LATENCY = Histogram("torn_api_request_seconds", "Torn API round trip time by endpoint.")
+QUEUE_WAIT = Histogram(
+    "torn_api_queue_wait_seconds",
+    "Time spent waiting for a rate limit token by lane.",
+)
+
+
+def record_request(endpoint: str, *, status: str, code: int, latency_s: float, api_key: str) -> None:
+    REQUESTS.inc(endpoint=endpoint, status=status, code=code, key_slot=key_slot(api_key))
+    LATENCY.observe(latency_s, endpoint=endpoint)
+
+
+def record_retry(endpoint: str) -> None:
+    RETRIES.inc(endpoint=endpoint)
+
+
+def record_queue_wait(priority: int, wait_s: float) -> None:
+    QUEUE_WAIT.observe(wait_s, lane=priority)
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for metric in (REQUESTS, RETRIES, LATENCY, QUEUE_WAIT):
+        lines.extend(metric.render())
+
+    # each family has to be one contiguous block, so the buckets are read
+    # once and every family is written out in full before the next
+    buckets = [(_fmt_labels(_labels(key_slot=key_slot(k))), b) for k, b in iter_buckets()]
+    lines.append("# HELP torn_api_key_budget_remaining Tokens left in each key's rate limit bucket.")
+    lines.append("# TYPE torn_api_key_budget_remaining gauge")
+    for slot, bucket in buckets:
+        lines.append(f"torn_api_key_budget_remaining{slot} {bucket.remaining():.2f}")
+    lines.append("# HELP torn_api_key_waiters Requests queued on each key's bucket.")
+    lines.append("# TYPE torn_api_key_waiters gauge")
+    for slot, bucket in buckets:
+        lines.append(f"torn_api_key_waiters{slot} {bucket.waiting()}")
+
+    lines.append("# HELP torn_api_circuit_open Whether the endpoint's circuit breaker is open.")
+    lines.append("# TYPE torn_api_circuit_open gauge")
+    for endpoint, breaker in iter_breakers():
+        lines.append(
+            f"torn_api_circuit_open{_fmt_labels(_labels(endpoint=endpoint))} {int(breaker.state == 'open')}"
+        )
+
+    stats = RESPONSE_CACHE.stats()
+    for name, help_text in (
+        ("hits", "Responses served from the cache, memory or disk."),
+        ("misses", "Cacheable requests that had to go to torn."),
+        ("disk_hits", "Responses served from the persisted cache."),
+        ("evictions", "Entries dropped from the in memory cache to stay under its size."),
+    ):
+        lines.append(f"# HELP torn_api_cache_{name}_total {help_text}")
+        lines.append(f"# TYPE torn_api_cache_{name}_total counter")
+        lines.append(f"torn_api_cache_{name}_total {stats[name]}")
+    lines.append("# HELP torn_api_cache_entries Responses currently held in memory.")
+    lines.append("# TYPE torn_api_cache_entries gauge")
+    lines.append(f"torn_api_cache_entries {stats['size']}")
+
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from torn_bot.config import TORN_RATE_LIMIT_PER_MIN
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DAILY = 1
+PRIORITY_FLIGHT = 2
+PRIORITY_BACKFILL = 3
+
+# share of a bucket each lane must leave untouched, so a slash command
+# arriving mid-sync still finds tokens without queueing
+_LANE_RESERVE = {
+    PRIORITY_INTERACTIVE: 0.0,
+    PRIORITY_DAILY: 0.0,
+    PRIORITY_FLIGHT: 0.1,
+    PRIORITY_BACKFILL: 0.25,
+}
+
+_PRIORITY: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "torn_request_priority",
+    default=PRIORITY_INTERACTIVE,
+)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    token = _PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> int:
+    return _PRIORITY.get()
+
+
+class Lane:
+    """
+    priority of one request that can still be raised while it queues, when
+    a caller from a busier lane joins a request already in flight
+
+    """
+
+    def __init__(self, priority: int | None = None):
+        self.priority = current_priority() if priority is None else priority
+        self.changed = asyncio.Event()
+
+    def raise_to(self, priority: int) -> None:
+        if priority < self.priority:
+            self.priority = priority
+            self.changed.set()
+
+
+# torn counts a key's requests over the last minute. a send is timed when it
+# leaves here and reaches torn a little later, the extra second keeps
+# latency jitter from squeezing two windows' worth into torn's one
+WINDOW_S = 61.0
+
+
+class RateWindow:
+    """
+    allows at most limit sends in any WINDOW_S, the same sliding window torn
+    enforces. a bucket that starts full and refills lets up to twice the
+    limit through a single minute. waiters are served lowest priority value
+    first then in arrival order
+
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._sent: deque[float] = deque()
+        # [priority, seq] per waiter, the priority can move while it waits
+        self._waiters: list[list[int]] = []
+        self._seq = itertools.count()
+
+    def _expire(self, now: float) -> None:
+        while self._sent and now - self._sent[0] >= WINDOW_S:
+            self._sent.popleft()
+
+    def remaining(self) -> float:
+        self._expire(time.monotonic())
+        return float(self.limit - len(self._sent))
+
+    def waiting(self, max_priority: int | None = None) -> int:
+        if max_priority is None:
+            return len(self._waiters)
+        return sum(1 for p, _ in self._waiters if p <= max_priority)
+
+    async def acquire(self, priority: int | Lane | None = None) -> None:
+        lane = priority if isinstance(priority, Lane) else Lane(priority)
+        entry = [lane.priority, next(self._seq)]
+        self._waiters.append(entry)
+        try:
+            while True:
+                entry[0] = lane.priority
+                need = 1 + math.ceil(self.limit * _LANE_RESERVE.get(lane.priority, 0.0))
+                now = time.monotonic()
+                self._expire(now)
+                free = self.limit - len(self._sent)
+                ahead = sum(1 for w in self._waiters if w < entry)
+                if ahead == 0 and free >= need:
+                    self._sent.append(now)
+                    return
+                # sleep until enough of the oldest sends have aged out
+                short = min(len(self._sent), need + ahead - free)
+                wait = self._sent[short - 1] + WINDOW_S - now if short > 0 else 0.0
+                lane.changed.clear()
+                try:
+                    await asyncio.wait_for(lane.changed.wait(), max(0.05, wait))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.remove(entry)
+
+
+_BUCKETS: Dict[str, RateWindow] = {}
+
+
+def get_bucket(api_key: str) -> RateWindow:
+    bucket = _BUCKETS.get(api_key)
+    if bucket is None:
+        bucket = RateWindow(TORN_RATE_LIMIT_PER_MIN)
+        _BUCKETS[api_key] = bucket
+    return bucket
+
+
+def iter_buckets() -> Iterator[Tuple[str, RateWindow]]:
+    return iter(list(_BUCKETS.items()))
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Iterator, Tuple, TypeVar
+
+from torn_bot.api.errors import TornAPIError, CircuitOpenError
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_S = 0.5
+BACKOFF_CAP_S = 30.0
+
+# torn error codes that will fail the same way however often they're sent
+# 1 empty key, 2 incorrect key, 3 wrong type, 4 wrong fields, 6 incorrect id,
+# 7 incorrect id-entity relation, 10 owner in federal jail, 13 owner inactive,
+# 16 access level too low, 18 key paused
+PERMANENT_CODES = {1, 2, 3, 4, 6, 7, 10, 13, 16, 18}
+
+# 5 too many requests, wait out the rest of torn's minute window
+SLOW_BACKOFF_CODES = {5: 15.0}
+
+BREAKER_FAILURES = 5
+BREAKER_OPEN_S = 30.0
+BREAKER_MAX_OPEN_S = 5 * 60.0
+
+
+def is_retryable(err: TornAPIError) -> bool:
+    return err.code not in PERMANENT_CODES
+
+
+def retry_delay(err: TornAPIError, attempt: int) -> float:
+    """
+    full jitter exponential backoff, a Retry-After from torn wins when it is
+    longer and slow codes start from a bigger base
+
+    """
+    base = SLOW_BACKOFF_CODES.get(err.code, BACKOFF_BASE_S)
+    delay = random.uniform(base / 2, min(BACKOFF_CAP_S, base * (2 ** attempt)))
+    if err.retry_after:
+        delay = max(delay, err.retry_after)
+    return delay
+
+
+class CircuitBreaker:
+    """
+    opens after BREAKER_FAILURES transient failures in a row, lets one probe
+    through once the open period ends and doubles the period each time the
+    probe fails
+
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self.open_until = 0.0
+        self.open_for = BREAKER_OPEN_S
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.open_until and time.monotonic() < self.open_until:
+            return "open"
+        if self.open_until:
+            return "half-open"
+        return "closed"
+
+    def before_request(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._probing):
+            wait = max(0.0, self.open_until - time.monotonic())
+            raise CircuitOpenError(self.name, wait)
+        if state == "half-open":
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.open_until = 0.0
+        self.open_for = BREAKER_OPEN_S
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing:
+            self._probing = False
+            self.open_for = min(BREAKER_MAX_OPEN_S, self.open_for * 2)
+            self.open_until = time.monotonic() + self.open_for
+        elif self.failures >= BREAKER_FAILURES:
+            self.open_until = time.monotonic() + self.open_for
+
+    def abandon(self) -> None:
+        """
+        the request ended without an answer either way, e.g. cancelled. a
+        probe still has to be released, it counts as failed
+
+        """
+        if self._probing:
+            self.record_failure()
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    breaker = _BREAKERS.get(endpoint)
+    if breaker is None:
+        breaker = CircuitBreaker(endpoint)
+        _BREAKERS[endpoint] = breaker
+    return breaker
+
+
+def iter_breakers() -> Iterator[Tuple[str, CircuitBreaker]]:
+    return iter(list(_BREAKERS.items()))
+
+
+async def call_with_retries(endpoint: str, send: Callable[[], Awaitable[T]]) -> T:
+    breaker = get_breaker(endpoint)
+    attempt = 0
+    while True:
+        breaker.before_request()
+        try:
+            result = await send()
+        except TornAPIError as e:
+            if not is_retryable(e):
+                # the endpoint answered, it's the request that's wrong
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS or breaker.state == "open":
+                raise
+            await asyncio.sleep(retry_delay(e, attempt))
+            continue
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        breaker.record_success()
+        return result
@@ -6,6 +6,9 @@ from torn_bot.commands.global_attacks import setup_global_attacks_command
 from torn_bot.commands.global_keys import setup_global_keys_commands
 from torn_bot.commands.faction_inactive import setup_faction_inactive_commands
 from torn_bot.commands.faction_leaderboard_daily import setup_faction_leaderboard_daily_commands
+from torn_bot.commands.faction_leaderboard import setup_faction_leaderboard_commands
+from torn_bot.commands.api_status import setup_api_status_commands
+from torn_bot.commands.backfill import setup_backfill_commands
 
 def setup_all_commands(tree, storage):
     setup_api_key_commands(tree, storage)
@@ -16,3 +19,6 @@ def setup_all_commands(tree, storage):
     setup_global_keys_commands(tree, storage)
     setup_faction_inactive_commands(tree, storage)
     setup_faction_leaderboard_daily_commands(tree, storage)
+    setup_faction_leaderboard_commands(tree, storage)
+    setup_api_status_commands(tree, storage)
+    setup_backfill_commands(tree, storage)
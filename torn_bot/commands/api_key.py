@@ -2,10 +2,11 @@ from discord import app_commands
 import discord
 
 from torn_bot.api.torn import fetch_torn_api, TornAPIError
-from torn_bot.storage import KeyStorage
+from torn_bot.api.key_pool import KEY_POOL
+from torn_bot.storage import AsyncKeyStorage
 
 
-def setup_api_key_commands(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_api_key_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(name="setapi", description="save your torn api key")
     @app_commands.describe(api_key="your torn api key")
@@ -13,7 +14,8 @@ def setup_api_key_commands(tree: app_commands.CommandTree, storage: KeyStorage):
         await interaction.response.defer(ephemeral=True)
         try:
             data = await fetch_torn_api("user", "basic", api_key)
-            storage.store_key(interaction.user.id, api_key)
+            await storage.store_key(interaction.user.id, api_key)
+            await KEY_POOL.load(storage)
 
             player_name = data.get("name", "Unknown")
             player_id = data.get("player_id", 0)
@@ -31,7 +33,44 @@ def setup_api_key_commands(tree: app_commands.CommandTree, storage: KeyStorage):
     @tree.command(name="deleteapi", description="delete your api key")
     async def deleteapi(interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        if storage.delete_key(interaction.user.id):
+        if await storage.delete_key(interaction.user.id):
+            await KEY_POOL.load(storage)
             await interaction.followup.send("done, api key removed", ephemeral=True)
         else:
             await interaction.followup.send("you don't have an api key saved", ephemeral=True)
+
+    keypool = app_commands.Group(
+        name="keypool",
+        description="share your api key with the bot's background jobs"
+    )
+    tree.add_command(keypool)
+
+    @keypool.command(name="join", description="let shared jobs (flight watch, names, VIP list) use your key")
+    async def keypool_join(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        if not await storage.get_key(interaction.user.id):
+            await interaction.followup.send("you need to set your api key first with /setapi", ephemeral=True)
+            return
+        if await storage.join_key_pool(interaction.user.id):
+            await KEY_POOL.load(storage)
+            await interaction.followup.send("done, your key is in the shared pool", ephemeral=True)
+        else:
+            await interaction.followup.send("your key is already in the shared pool", ephemeral=True)
+
+    @keypool.command(name="leave", description="stop shared jobs using your key")
+    async def keypool_leave(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        if await storage.leave_key_pool(interaction.user.id):
+            await KEY_POOL.load(storage)
+            await interaction.followup.send("done, your key left the shared pool", ephemeral=True)
+        else:
+            await interaction.followup.send("your key isn't in the shared pool", ephemeral=True)
+
+    @keypool.command(name="status", description="show how many keys are in the shared pool")
+    async def keypool_status(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        status = KEY_POOL.status()
+        await interaction.followup.send(
+            f"shared pool: {status['healthy']} healthy / {status['enrolled']} enrolled keys",
+            ephemeral=True
+        )
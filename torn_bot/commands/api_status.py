@@ -0,0 +1,31 @@
+import discord
+from discord import app_commands
+
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.api.cache import RESPONSE_CACHE
+from torn_bot.config import is_owner
+
+
+def setup_api_status_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
+
+    @tree.command(
+        name="api_status",
+        description="Owner only: show Torn API cache stats."
+    )
+    async def api_status(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+
+        if not is_owner(interaction.user.id):
+            await interaction.followup.send("not allowed.", ephemeral=True)
+            return
+
+        stats = RESPONSE_CACHE.stats()
+        lines = [
+            "**Response cache**",
+            f"• Hits: {stats['hits']} (disk {stats['disk_hits']})",
+            f"• Misses: {stats['misses']}",
+            f"• Hit ratio: {stats['hit_ratio'] * 100:.1f}%",
+            f"• Entries: {stats['size']} / {stats['max_size']}",
+            f"• Evictions: {stats['evictions']}",
+        ]
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+
+import discord
+from discord import app_commands
+
+try:
+    from zoneinfo import ZoneInfo
+    LONDON = ZoneInfo("Europe/London")
+except Exception:
+    LONDON = timezone.utc
+
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import run_db
+from torn_bot.services.backfill import iter_backfills
+from torn_bot.services.faction_leaderboard_store import rebuild_totals
+from torn_bot.config import is_owner
+
+
+def _fmt_ts(ts) -> str:
+    if not ts:
+        return "?"
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).astimezone(LONDON).strftime("%d/%m/%y %H:%M")
+
+
+def _fmt_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rem = divmod(seconds, 3600)
+    minutes = rem // 60
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+def setup_backfill_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
+
+    @tree.command(
+        name="backfill_status",
+        description="Owner only: show faction attack backfill progress."
+    )
+    async def backfill_status(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+
+        if not is_owner(interaction.user.id):
+            await interaction.followup.send("not allowed.", ephemeral=True)
+            return
+
+        statuses = [engine.status() for engine in iter_backfills()]
+        statuses = [s for s in statuses if s["planned"]]
+        if not statuses:
+            await interaction.followup.send(
+                "backfill has not started yet (waiting for the first sync).",
+                ephemeral=True
+            )
+            return
+
+        lines = []
+        for status in statuses:
+            if lines:
+                lines.append("")
+            lines += [
+                f"**Attack backfill: faction {status['faction_id']}**",
+                f"• Progress: {status['progress'] * 100:.1f}%",
+                f"• Pages this run: {status['pages']} (added {status['added']})",
+                f"• History starts: {_fmt_ts(status['floor'])}",
+            ]
+            if status["done"]:
+                lines.append("• Complete")
+            elif status["eta_s"] is not None:
+                lines.append(f"• ETA: {_fmt_duration(status['eta_s'])}")
+            for i, w in enumerate(status["windows"], start=1):
+                state = "done" if w["done"] else f"at {_fmt_ts(w['to'])}"
+                lines.append(f"• Window {i}: {_fmt_ts(w['lo'])} - {_fmt_ts(w['hi'])}, {state}")
+            if status["last_error"]:
+                lines.append(f"• Last error: {status['last_error']}")
+        await interaction.followup.send("\n".join(lines)[:1900], ephemeral=True)
+
+    @tree.command(
+        name="leaderboard_rebuild",
+        description="Owner only: recompute leaderboard totals from stored attacks."
+    )
+    async def leaderboard_rebuild(interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+
+        if not is_owner(interaction.user.id):
+            await interaction.followup.send("not allowed.", ephemeral=True)
+            return
+
+        try:
+            result = await run_db(rebuild_totals)
+        except Exception as e:
+            await interaction.followup.send(f"rebuild failed: {e}", ephemeral=True)
+            return
+
+        drift = result["drift"]
+        lines = [
+            "**Leaderboard rebuild**",
+            f"• Attacks scanned: {result['scanned']}",
+            f"• Attackers: {result['attackers']} ({result['drifted']} had drifted)",
+        ]
+        if result["drifted"]:
+            lines.append(
+                f"• Drift: attacks {drift['attacks']:.0f}, mugs {drift['mugs']:.0f}, "
+                f"hosp {drift['hosp']:.0f}, respect {drift['respect_gain']:.2f}, "
+                f"mugged ${drift['mugged']:,.0f}"
+            )
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
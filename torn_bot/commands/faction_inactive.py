@@ -4,10 +4,12 @@ import discord
 from discord import app_commands
 
 from torn_bot.api.torn_v2 import TornAPIError, fetch_torn_v2
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import run_db
+from torn_bot.services.player_names import record_names
 
 
-def setup_faction_inactive_commands(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_faction_inactive_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(
         name="faction_inactive",
@@ -19,7 +21,7 @@ def setup_faction_inactive_commands(tree: app_commands.CommandTree, storage: Key
         except discord.NotFound:
             return
 
-        api_key = storage.get_global_key("faction") or storage.get_key(interaction.user.id)
+        api_key = await storage.get_global_key("faction") or await storage.get_key(interaction.user.id)
         if not api_key:
             await interaction.followup.send(
                 "no API key available. Owners must run /set_global_faction_api first",
@@ -70,6 +72,11 @@ def setup_faction_inactive_commands(tree: app_commands.CommandTree, storage: Key
                 inactive.append((last_ts, tid, name, rel))
 
         inactive.sort(key=lambda row: row[0])
+        await run_db(record_names, {
+            int(info.get("id") or 0): info.get("name")
+            for info in iterable
+            if str(info.get("id") or "").isdigit()
+        })
 
         header_lines = [
             f"**Total inactive members (24 hours):** {len(inactive)} / {len(members)}",
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+try:
+    from zoneinfo import ZoneInfo
+    LONDON = ZoneInfo("Europe/London")
+except Exception:
+    LONDON = timezone.utc
+
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import run_db
+from torn_bot.api.torn_v2 import TornAPIError
+from torn_bot.services.faction_attacks import london_day_start_utc_ts
+from torn_bot.services.faction_leaderboard_store import (
+    sync_faction_attacks,
+    get_store_coverage,
+    get_range_leaderboard,
+    get_stored_names,
+    covers,
+)
+from torn_bot.services.factions import faction_key_for
+from torn_bot.services.name_resolver import resolve_names
+
+
+PRESETS = {
+    "today": "Today (London)",
+    "24h": "Last 24 hours",
+    "7d": "Last 7 days",
+    "week": "This week (from Monday)",
+    "month": "This month",
+    "30d": "Last 30 days",
+    "all": "All time",
+}
+
+_DATE_FORMATS = ("%d/%m/%y", "%d/%m/%Y", "%Y-%m-%d")
+
+
+def parse_london_date(text: str) -> Optional[datetime]:
+    text = (text or "").strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=LONDON)
+        except ValueError:
+            continue
+    return None
+
+
+def preset_range(preset: str, now_utc: datetime) -> tuple[int, int]:
+    now_ts = int(now_utc.timestamp())
+    now_lon = now_utc.astimezone(LONDON)
+    midnight = now_lon.replace(hour=0, minute=0, second=0, microsecond=0)
+    if preset == "today":
+        since = london_day_start_utc_ts()
+    elif preset == "24h":
+        since = now_ts - 24 * 60 * 60
+    elif preset == "7d":
+        since = now_ts - 7 * 24 * 60 * 60
+    elif preset == "week":
+        monday = midnight - timedelta(days=midnight.weekday())
+        since = int(monday.timestamp())
+    elif preset == "month":
+        since = int(midnight.replace(day=1).timestamp())
+    elif preset == "30d":
+        since = now_ts - 30 * 24 * 60 * 60
+    else:
+        since = 0
+    return since, now_ts + 1
+
+
+def setup_faction_leaderboard_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
+
+    @tree.command(
+        name="faction_leaderboard",
+        description="Faction leaderboard for a preset or custom date range (London time)."
+    )
+    @app_commands.describe(
+        preset="Time range to rank (ignored when start is given)",
+        start="Start date, DD/MM/YY or YYYY-MM-DD (e.g. a war start)",
+        end="End date inclusive, DD/MM/YY or YYYY-MM-DD (defaults to now)",
+        top="How many players to list per category",
+        faction_id="Allied faction id (defaults to the main faction)",
+    )
+    @app_commands.choices(
+        preset=[app_commands.Choice(name=label, value=key) for key, label in PRESETS.items()]
+    )
+    async def faction_leaderboard(
+        interaction: discord.Interaction,
+        preset: Optional[app_commands.Choice[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        top: app_commands.Range[int, 1, 10] = 5,
+        faction_id: Optional[int] = None,
+    ):
+        try:
+            await interaction.response.defer(ephemeral=False)
+        except discord.NotFound:
+            return
+
+        try:
+            picked = await faction_key_for(storage, faction_id=faction_id, user_id=interaction.user.id)
+        except TornAPIError as e:
+            await interaction.followup.send(f"Couldn't look up faction: {e.message}", ephemeral=True)
+            return
+        if not picked:
+            await interaction.followup.send(
+                "no API key available for that faction. Owners must run /set_global_faction_api "
+                "or /add_allied_faction_api first",
+                ephemeral=True
+            )
+            return
+        faction_id, api_key = picked
+
+        now_utc = datetime.now(timezone.utc)
+        if start:
+            start_dt = parse_london_date(start)
+            end_dt = parse_london_date(end) if end else None
+            if start_dt is None or (end and end_dt is None):
+                await interaction.followup.send(
+                    "couldn't read that date. use DD/MM/YY or YYYY-MM-DD",
+                    ephemeral=True
+                )
+                return
+            since_utc = int(start_dt.timestamp())
+            if end_dt is not None:
+                until_utc = int((end_dt + timedelta(days=1)).timestamp())
+            else:
+                until_utc = int(now_utc.timestamp()) + 1
+            if until_utc <= since_utc:
+                await interaction.followup.send("end date is before start date.", ephemeral=True)
+                return
+            title = f"{start_dt.strftime('%d/%m/%y')} - {(end_dt or now_utc.astimezone(LONDON)).strftime('%d/%m/%y')}"
+        else:
+            key = preset.value if preset else "today"
+            since_utc, until_utc = preset_range(key, now_utc)
+            title = PRESETS[key]
+
+        sync_error = None
+        try:
+            await sync_faction_attacks(faction_id, api_key)
+        except TornAPIError as e:
+            sync_error = e.message
+        except Exception as e:
+            sync_error = str(e)
+
+        try:
+            coverage = await run_db(get_store_coverage, faction_id)
+            board = await run_db(get_range_leaderboard, faction_id, since_utc, until_utc, top_n=top)
+        except Exception as e:
+            await interaction.followup.send(f"Error building leaderboard: {e}", ephemeral=True)
+            return
+
+        rankings = board["rankings"]
+        ids_to_resolve = {aid for rows in rankings.values() for aid, _ in rows}
+        name_map = await run_db(get_stored_names, ids_to_resolve)
+        missing = ids_to_resolve - set(name_map)
+        if missing:
+            name_map.update(await resolve_names(api_key, missing))
+
+        def profile_link(tid: int) -> str:
+            nm = name_map.get(tid)
+            if nm:
+                return f"[{nm} [{tid}]](https://www.torn.com/profiles.php?XID={tid})"
+            return f"`{tid}`"
+
+        sections = (
+            ("Most attacks", "attacks", "{:.0f}"),
+            ("Most mugs", "mugs", "{:.0f}"),
+            ("Most hospitals", "hosp", "{:.0f}"),
+            ("Most respect gained", "respect_gain", "{:+.2f}"),
+            ("Most money mugged", "mugged", "${:,.0f}"),
+        )
+
+        summary = board["summary"]
+        lines = [
+            f"**Faction Leaderboard: {title}**",
+            "",
+            f"Attacks: `{summary['attacks']}` | Mugs: `{summary['mugs']}` | "
+            f"Hospitals: `{summary['hosp']}` | Respect: `{summary['respect_gain']:+.2f}`",
+        ]
+        if not board["attackers"]:
+            lines.append("")
+            lines.append("No attacks found in this range.")
+        for label, cat, fmt in sections:
+            rows = rankings.get(cat) or []
+            if not rows:
+                continue
+            lines.append("")
+            lines.append(f"**{label}**")
+            for pos, (tid, val) in enumerate(rows, start=1):
+                lines.append(f"{pos}. {profile_link(tid)} - `{fmt.format(val)}`")
+
+        lines.append("")
+        if not covers(coverage, since_utc) and coverage.get("covered_since"):
+            covered = datetime.fromtimestamp(int(coverage["covered_since"]), tz=timezone.utc).astimezone(LONDON)
+            lines.append(f"Note: stored attacks only reach back to {covered.strftime('%d/%m/%y %H:%M')}")
+        synced_at = coverage.get("synced_at")
+        if synced_at:
+            synced = datetime.fromtimestamp(int(synced_at), tz=timezone.utc).astimezone(LONDON)
+            lines.append(f"Data as of {synced.strftime('%H:%M:%S')} London")
+        if sync_error:
+            lines.append(f"Sync note: {sync_error}")
+
+        await interaction.followup.send("\n".join(lines)[:1900])
@@ -12,17 +12,20 @@ try:
 except Exception:
     LONDON = timezone.utc
 
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import run_db
 from torn_bot.api.torn_v2 import TornAPIError
 from torn_bot.services.faction_attacks import fetch_today_faction_attacks
 from torn_bot.services.faction_leaderboard_store import (
     sync_faction_attacks,
     get_overall_leaderboard,
 )
+from torn_bot.services.factions import faction_key_for
 from torn_bot.services.name_resolver import resolve_names
 
 
 async def build_faction_leaderboard_daily_message(
+    faction_id: int,
     api_key: str,
     *,
     include_backfill_status: bool = True,
@@ -40,7 +43,7 @@ async def build_faction_leaderboard_daily_message(
         today_error = str(e)
 
     try:
-        await sync_faction_attacks(api_key)
+        await sync_faction_attacks(faction_id, api_key)
     except TornAPIError as e:
         sync_error = e.message
     except Exception as e:
@@ -121,12 +124,9 @@ async def build_faction_leaderboard_daily_message(
         most_hosp_id, most_hosp = top_by("hosp")
         most_rg_id, most_rg = top_by("rg")
 
-    overall = get_overall_leaderboard()
-    overall_ids = set()
-    for key in ("most_attacks", "most_mugs", "most_hosp", "most_rg", "best_mug"):
-        row = overall.get(key)
-        if row and row[0]:
-            overall_ids.add(int(row[0]))
+    overall = await run_db(get_overall_leaderboard, faction_id, top_n=3)
+    rankings = overall["rankings"]
+    overall_ids = {aid for rows in rankings.values() for aid, _ in rows}
 
     ids_to_resolve = set(overall_ids)
     if stats:
@@ -150,7 +150,7 @@ async def build_faction_leaderboard_daily_message(
         if tid and nm and tid not in seeded:
             seeded[tid] = nm
 
-    resolved = await resolve_names(api_key, ids_to_resolve)
+    resolved = await resolve_names(api_key, ids_to_resolve) if ids_to_resolve else {}
     name_map = dict(resolved)
     name_map.update(seeded)
 
@@ -162,19 +162,22 @@ async def build_faction_leaderboard_daily_message(
             return f"[{nm} [{tid}]](https://www.torn.com/profiles.php?XID={tid})"
         return f"`{tid}`"
 
-    def fmt_row(row, fmt: str) -> str:
-        if not row:
-            return "`?`"
-        return fmt.format(profile_link(int(row[0])), row[1])
-
-    overall_lines = [
-        "**Faction Leaderboard Overall**",
-        "",
-        f"Most attacks: {fmt_row(overall.get('most_attacks'), '{} - `{}`')}",
-        f"Most mugs: {fmt_row(overall.get('most_mugs'), '{} - `{}`')}",
-        f"Most respect gained: {fmt_row(overall.get('most_rg'), '{} - `{:+.2f}`')}",
-        "",
-    ]
+    overall_sections = (
+        ("Most attacks", "attacks", "{:.0f}"),
+        ("Most mugs", "mugs", "{:.0f}"),
+        ("Most respect gained", "respect_gain", "{:+.2f}"),
+    )
+
+    overall_lines = ["**Faction Leaderboard Overall**"]
+    for label, cat, fmt in overall_sections:
+        overall_lines.append("")
+        overall_lines.append(f"**{label}**")
+        rows = rankings.get(cat) or []
+        if not rows:
+            overall_lines.append("`?`")
+        for pos, (tid, val) in enumerate(rows, start=1):
+            overall_lines.append(f"{pos}. {profile_link(tid)} - `{fmt.format(val)}`")
+    overall_lines.append("")
     tracked_since = overall.get("tracked_since")
     if tracked_since:
         try:
@@ -224,7 +227,7 @@ async def build_faction_leaderboard_daily_message(
     return "\n".join(msg_lines)[:1900]
 
 
-def setup_faction_leaderboard_daily_commands(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_faction_leaderboard_daily_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(
         name="faction_leaderboard_daily",
@@ -236,16 +239,21 @@ def setup_faction_leaderboard_daily_commands(tree: app_commands.CommandTree, sto
         except discord.NotFound:
             return
 
-        api_key = storage.get_global_key("faction") or storage.get_key(interaction.user.id)
-        if not api_key:
+        try:
+            picked = await faction_key_for(storage, user_id=interaction.user.id)
+        except TornAPIError as e:
+            await interaction.followup.send(f"Couldn't look up faction: {e.message}", ephemeral=True)
+            return
+        if not picked:
             await interaction.followup.send(
                 "no API key available. Owners must run /set_global_faction_api first",
                 ephemeral=True
             )
             return
+        faction_id, api_key = picked
 
         try:
-            msg = await build_faction_leaderboard_daily_message(api_key)
+            msg = await build_faction_leaderboard_daily_message(faction_id, api_key)
         except Exception as e:
             await interaction.followup.send(f"Error building leaderboard: {e}", ephemeral=True)
             return
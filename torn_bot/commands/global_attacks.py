@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
 from collections import defaultdict
+from typing import Optional
 
 import discord
 from discord import app_commands
@@ -12,49 +13,60 @@ try:
 except Exception:
     LONDON = timezone.utc
 
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
 from torn_bot.api.torn_v2 import TornAPIError
+from torn_bot.db import run_db
 from torn_bot.services.faction_attacks import (
-    fetch_today_faction_attacks,
+    london_day_start_utc_ts,
     fetch_faction_attacks_since,
 )
+from torn_bot.services.faction_leaderboard_store import (
+    sync_faction_attacks,
+    get_store_coverage,
+    get_window_totals,
+    get_stored_names,
+    covers,
+)
+from torn_bot.services.factions import faction_key_for
 from torn_bot.services.name_resolver import resolve_names
 
 
-def setup_global_attacks_command(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_global_attacks_command(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(
         name="global_faction_attacks",
         description="Show today's faction attacks with useful summaries (London time)."
     )
-    async def global_faction_attacks(interaction: discord.Interaction):
+    @app_commands.describe(faction_id="Allied faction id (defaults to the main faction)")
+    async def global_faction_attacks(interaction: discord.Interaction, faction_id: Optional[int] = None):
         try:
             await interaction.response.defer(ephemeral=False)
         except discord.NotFound:
             return
 
-        api_key = storage.get_global_key("faction") or storage.get_key(interaction.user.id)
-        if not api_key:
+        try:
+            picked = await faction_key_for(storage, faction_id=faction_id, user_id=interaction.user.id)
+        except TornAPIError as e:
+            await interaction.followup.send(f"Couldn't look up faction: {e.message}", ephemeral=True)
+            return
+        if not picked:
             await interaction.followup.send(
-                "no API key available. Owners must run /set_global_faction_api first",
+                "no API key available for that faction. Owners must run /set_global_faction_api "
+                "or /add_allied_faction_api first",
                 ephemeral=True
             )
             return
+        faction_id, api_key = picked
 
         try:
-            today_attacks = await fetch_today_faction_attacks(api_key, page_limit=8, per_page=100)
+            await sync_faction_attacks(faction_id, api_key)
+            sync_error = None
         except TornAPIError as e:
-            await interaction.followup.send(f"Couldn't fetch attacks: {e.message}", ephemeral=True)
-            return
+            sync_error = e.message
         except Exception as e:
-            await interaction.followup.send(f"Error fetching attacks: {e}", ephemeral=True)
-            return
+            sync_error = str(e)
 
-        today_str = datetime.now(tz=LONDON).strftime("%d/%m/%y")
-
-        if not today_attacks:
-            await interaction.followup.send(f"**Faction attacks today ({today_str})**\n\nNo attacks found.")
-            return
+        coverage = await run_db(get_store_coverage, faction_id)
 
         def safe_str(x) -> str:
             if x is None:
@@ -79,72 +91,99 @@ def setup_global_attacks_command(tree: app_commands.CommandTree, storage: KeySto
         def profile_link(name: str, tid: int) -> str:
             return f"[{name} [{tid}]](https://www.torn.com/profiles.php?XID={tid})"
 
-        hosp: list[dict] = []
-        mugs: list[dict] = []
-        other: list[dict] = []
-
-        total_rg = 0.0
-        total_rl = 0.0
-
-        for a in today_attacks:
-            res_l = safe_str(a.get("result", "")).lower()
+        seeded: dict[int, str] = {}
+        used_api = False
 
-            rg = to_float(a.get("respect_gain", 0))
-            rl = to_float(a.get("respect_loss", 0))
-            total_rg += rg
-            total_rl += rl
+        def totals_from_attacks(attacks: list[dict]) -> dict[int, dict]:
+            totals = defaultdict(lambda: {"attacks": 0, "mugs": 0, "hosp": 0, "respect_gain": 0.0, "respect_loss": 0.0})
+            for a in attacks:
+                for side in ("attacker", "defender"):
+                    p = a.get(side) or {}
+                    try:
+                        tid = int(p.get("id", 0) or 0)
+                    except Exception:
+                        continue
+                    nm = safe_str(p.get("name", ""))
+                    if tid and nm and tid not in seeded:
+                        seeded[tid] = nm
 
-            if "hospital" in res_l:
-                hosp.append(a)
-            elif "mug" in res_l:
-                mugs.append(a)
-            else:
-                other.append(a)
+                aid = attacker_id(a)
+                if not aid:
+                    continue
+                res_l = safe_str(a.get("result", "")).lower()
+                t = totals[aid]
+                t["attacks"] += 1
+                if "hospital" in res_l:
+                    t["hosp"] += 1
+                elif "mug" in res_l:
+                    t["mugs"] += 1
+                t["respect_gain"] += to_float(a.get("respect_gain", 0))
+                t["respect_loss"] += to_float(a.get("respect_loss", 0))
+            return totals
+
+        async def window_totals(since_utc: int, page_limit: int) -> dict[int, dict]:
+            nonlocal used_api
+            if covers(coverage, since_utc):
+                return await run_db(get_window_totals, faction_id, since_utc, now_ts + 1)
+            used_api = True
+            attacks = await fetch_faction_attacks_since(api_key, since_utc=since_utc, page_limit=page_limit, per_page=100)
+            return totals_from_attacks(attacks)
 
         now_utc = datetime.now(timezone.utc)
+        now_ts = int(now_utc.timestamp())
         since_24h = int((now_utc - timedelta(hours=24)).timestamp())
         since_7d = int((now_utc - timedelta(days=7)).timestamp())
 
         try:
-            attacks_24h = await fetch_faction_attacks_since(api_key, since_utc=since_24h, page_limit=12, per_page=100)
+            today_totals = await window_totals(london_day_start_utc_ts(), page_limit=8)
+        except TornAPIError as e:
+            await interaction.followup.send(f"Couldn't fetch attacks: {e.message}", ephemeral=True)
+            return
+        except Exception as e:
+            await interaction.followup.send(f"Error fetching attacks: {e}", ephemeral=True)
+            return
+
+        today_str = datetime.now(tz=LONDON).strftime("%d/%m/%y")
+
+        if not today_totals:
+            await interaction.followup.send(f"**Faction attacks today ({today_str})**\n\nNo attacks found.")
+            return
+
+        total_attacks = sum(t["attacks"] for t in today_totals.values())
+        total_hosp = sum(t["hosp"] for t in today_totals.values())
+        total_mugs = sum(t["mugs"] for t in today_totals.values())
+        total_rg = sum(t["respect_gain"] for t in today_totals.values())
+        total_rl = sum(t["respect_loss"] for t in today_totals.values())
+
+        try:
+            totals_24h = await window_totals(since_24h, page_limit=12)
         except Exception:
-            attacks_24h = []
+            totals_24h = {}
 
         try:
-            attacks_7d = await fetch_faction_attacks_since(api_key, since_utc=since_7d, page_limit=60, per_page=100)
+            totals_7d = await window_totals(since_7d, page_limit=60)
         except Exception:
-            attacks_7d = []
+            totals_7d = {}
 
-        def top_respect_earners(attacks: list[dict], top_n: int = 5) -> list[tuple[int, float]]:
-            totals = defaultdict(float)
-            for a in attacks:
-                aid = attacker_id(a)
-                if not aid:
-                    continue
-                totals[aid] += to_float(a.get("respect_gain", 0))
-            ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+        def top_respect_earners(totals: dict[int, dict], top_n: int = 5) -> list[tuple[int, float]]:
+            ranked = sorted(
+                ((aid, float(t["respect_gain"] or 0)) for aid, t in totals.items()),
+                key=lambda kv: kv[1],
+                reverse=True,
+            )
             return ranked[:top_n]
 
-        top24 = top_respect_earners(attacks_24h, top_n=5)
-        top7d = top_respect_earners(attacks_7d, top_n=5)
+        top24 = top_respect_earners(totals_24h, top_n=5)
+        top7d = top_respect_earners(totals_7d, top_n=5)
 
         ids_to_resolve = {tid for tid, _ in top24}
         ids_to_resolve |= {tid for tid, _ in top7d}
 
-        seeded: dict[int, str] = {}
-        for group in (attacks_24h, attacks_7d):
-            for a in group:
-                for side in ("attacker", "defender"):
-                    p = a.get(side) or {}
-                    try:
-                        tid = int(p.get("id", 0) or 0)
-                    except Exception:
-                        continue
-                    nm = safe_str(p.get("name", ""))
-                    if tid and nm and tid not in seeded:
-                        seeded[tid] = nm
+        stored_names = await run_db(get_stored_names, ids_to_resolve - set(seeded))
+        seeded.update(stored_names)
 
-        resolved = await resolve_names(api_key, ids_to_resolve)
+        missing = ids_to_resolve - set(seeded)
+        resolved = await resolve_names(api_key, missing) if missing else {}
         name_map = dict(resolved)
         name_map.update(seeded)
 
@@ -164,9 +203,9 @@ def setup_global_attacks_command(tree: app_commands.CommandTree, storage: KeySto
         msg1_lines.append(f"**Faction attacks today ({today_str})**")
         msg1_lines.append("")
         msg1_lines.append("**Summary**")
-        msg1_lines.append(f"• Attacks: {len(today_attacks)}")
-        msg1_lines.append(f"• Hospitals: {len(hosp)}")
-        msg1_lines.append(f"• Mugs: {len(mugs)}")
+        msg1_lines.append(f"• Attacks: {total_attacks}")
+        msg1_lines.append(f"• Hospitals: {total_hosp}")
+        msg1_lines.append(f"• Mugs: {total_mugs}")
         msg1_lines.append(f"• Respect: {fmt_signed(total_rg)} / {fmt_signed(-total_rl)}")
         msg1_lines.append("")
         msg1_lines.append("**Top respect earners**")
@@ -191,4 +230,15 @@ def setup_global_attacks_command(tree: app_commands.CommandTree, storage: KeySto
         else:
             msg1_lines.append("**7 days:** (no data)")
 
+        msg1_lines.append("")
+        synced_at = coverage.get("synced_at")
+        if used_api:
+            msg1_lines.append("Data: fetched live from Torn (local store does not cover this range yet)")
+        elif synced_at:
+            age = max(0, now_ts - int(synced_at))
+            synced_str = datetime.fromtimestamp(int(synced_at), tz=timezone.utc).astimezone(LONDON).strftime("%H:%M:%S")
+            msg1_lines.append(f"Data as of {synced_str} London ({age}s ago)")
+        if sync_error:
+            msg1_lines.append(f"Sync note: {sync_error}")
+
         await interaction.followup.send("\n".join(msg1_lines)[:1900])
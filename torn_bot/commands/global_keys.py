@@ -1,12 +1,14 @@
 import discord
 from discord import app_commands
 
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
 from torn_bot.api.torn_v2 import fetch_torn_v2, TornAPIError
 from torn_bot.config import is_owner
+from torn_bot.services.backfill import stop_backfill
+from torn_bot.services.factions import ALLIED_KEY_PREFIX, faction_id_for_key
 
 
-def setup_global_keys_commands(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_global_keys_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(
         name="set_global_faction_api",
@@ -39,7 +41,7 @@ def setup_global_keys_commands(tree: app_commands.CommandTree, storage: KeyStora
             )
             return
 
-        storage.store_global_key("faction", api_key)
+        await storage.store_global_key("faction", api_key)
         await interaction.followup.send(
             "saved. global faction key updated (encrypted).",
             ephemeral=True
@@ -56,7 +58,7 @@ def setup_global_keys_commands(tree: app_commands.CommandTree, storage: KeyStora
             await interaction.followup.send("not allowed.", ephemeral=True)
             return
 
-        if storage.delete_global_key("faction"):
+        if await storage.delete_global_key("faction"):
             await interaction.followup.send(
                 "deleted. global faction key removed.",
                 ephemeral=True
@@ -66,3 +68,65 @@ def setup_global_keys_commands(tree: app_commands.CommandTree, storage: KeyStora
                 "no global faction key was set.",
                 ephemeral=True
             )
+
+    @tree.command(
+        name="add_allied_faction_api",
+        description="Owner only: track another faction's attacks with its own key."
+    )
+    @app_commands.describe(api_key="Faction-capable Torn API key from the allied faction")
+    async def add_allied_faction_api(interaction: discord.Interaction, api_key: str):
+        await interaction.response.defer(ephemeral=True)
+
+        if not is_owner(interaction.user.id):
+            await interaction.followup.send("not allowed.", ephemeral=True)
+            return
+
+        try:
+            faction_id = await faction_id_for_key(api_key)
+            await fetch_torn_v2(
+                "/faction/attacksfull",
+                api_key=api_key,
+                params={"limit": 1, "sort": "DESC"}
+            )
+        except TornAPIError as e:
+            await interaction.followup.send(
+                f"key rejected by Torn: {e.message}",
+                ephemeral=True
+            )
+            return
+        except Exception as e:
+            await interaction.followup.send(
+                f"unexpected error verifying key: {e}",
+                ephemeral=True
+            )
+            return
+
+        await storage.store_global_key(f"{ALLIED_KEY_PREFIX}{faction_id}", api_key)
+        await interaction.followup.send(
+            f"saved. faction {faction_id} will be synced from the next run (encrypted).",
+            ephemeral=True
+        )
+
+    @tree.command(
+        name="remove_allied_faction_api",
+        description="Owner only: stop tracking an allied faction."
+    )
+    @app_commands.describe(faction_id="Torn faction id")
+    async def remove_allied_faction_api(interaction: discord.Interaction, faction_id: int):
+        await interaction.response.defer(ephemeral=True)
+
+        if not is_owner(interaction.user.id):
+            await interaction.followup.send("not allowed.", ephemeral=True)
+            return
+
+        if await storage.delete_global_key(f"{ALLIED_KEY_PREFIX}{faction_id}"):
+            stop_backfill(faction_id)
+            await interaction.followup.send(
+                f"deleted. faction {faction_id} is no longer synced, its stored attacks are kept.",
+                ephemeral=True
+            )
+        else:
+            await interaction.followup.send(
+                f"no key was set for faction {faction_id}.",
+                ephemeral=True
+            )
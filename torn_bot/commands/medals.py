@@ -2,17 +2,17 @@ from discord import app_commands
 import discord
 
 from torn_bot.api.torn import fetch_torn_api, TornAPIError
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
 
 
-def setup_medals_commands(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_medals_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(name="medals", description="check what medals a player has")
     @app_commands.describe(torn_id="the player's torn id")
     async def medals(interaction: discord.Interaction, torn_id: int):
         await interaction.response.defer(ephemeral=False)
 
-        api_key = storage.get_key(interaction.user.id)
+        api_key = await storage.get_key(interaction.user.id)
         if not api_key:
             await interaction.followup.send("you need to set your api key first with /setapi", ephemeral=True)
             return
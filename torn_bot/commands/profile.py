@@ -2,17 +2,19 @@ from discord import app_commands
 import discord
 
 from torn_bot.api.torn import fetch_torn_api, TornAPIError
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import run_db
+from torn_bot.services.player_names import record_names
 
 
-def setup_profile_commands(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_profile_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(name="profile", description="show a torn profile")
     @app_commands.describe(player_id="player id to look up (leave blank for yourself)")
     async def profile(interaction: discord.Interaction, player_id: int = None):
         await interaction.response.defer(ephemeral=False)
 
-        api_key = storage.get_key(interaction.user.id)
+        api_key = await storage.get_key(interaction.user.id)
         if not api_key:
             await interaction.followup.send(
                 "you need to set your api key first with /setapi\n\nget your key from https://www.torn.com/preferences.php#tab=api",
@@ -25,6 +27,8 @@ def setup_profile_commands(tree: app_commands.CommandTree, storage: KeyStorage):
 
             name = data.get("name", "Unknown")
             pid = data.get("player_id", 0)
+            if pid and name != "Unknown":
+                await run_db(record_names, {int(pid): name})
             level = data.get("level", 0)
             rank = data.get("rank", "Unknown")
             age = data.get("age", 0)
@@ -1,14 +1,20 @@
 from discord import app_commands
 import discord
-import aiohttp
+import asyncio
 import re
 import textwrap
 
-from torn_bot.api.torn import fetch_torn_api
-from torn_bot.storage import KeyStorage
-from torn_bot.config import TORN_API_BASE
+from torn_bot.api.torn import fetch_torn_api, TornAPIError
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import run_db
+from torn_bot.services.player_names import record_names
 
 
+TARGET_FETCH_CONCURRENCY = 8
+# torn codes for a selection the key may not read: 4 wrong fields,
+# 7 incorrect id-entity relation, 16 access level too low
+STATS_REFUSED_CODES = {4, 7, 16}
+
 NETWORTH_MEDAL_TYPES = {"NTW", "NWT", "Networth", "Net Worth"}
 NETWORTH_MEDAL_ORDER = [
     "Apprentice",
@@ -175,14 +181,14 @@ def _table_rows(values: list) -> list[str]:
     return row_lines
 
 
-def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
+def setup_targets_commands(tree: app_commands.CommandTree, storage: AsyncKeyStorage):
 
     @tree.command(name="targets_add", description="add players to your target list")
     @app_commands.describe(torn_ids="player ids separated by commas, e.g. 1234,5678,9012")
     async def targets_add(interaction: discord.Interaction, torn_ids: str):
         await interaction.response.defer(ephemeral=False)
 
-        api_key = storage.get_key(interaction.user.id)
+        api_key = await storage.get_key(interaction.user.id)
         if not api_key:
             await interaction.followup.send("you need to set your api key first with /setapi", ephemeral=True)
             return
@@ -195,8 +201,9 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
                 torn_id = int(id_str)
                 data = await fetch_torn_api("user", "basic", api_key, torn_id)
                 player_name = data.get("name", "Unknown")
+                await run_db(record_names, {torn_id: data.get("name")})
 
-                if storage.add_target(interaction.user.id, torn_id):
+                if await storage.add_target(interaction.user.id, torn_id):
                     added.append(f"{player_name} [{torn_id}]")
                 else:
                     already_exists.append(f"{player_name} [{torn_id}]")
@@ -229,7 +236,7 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
         for id_str in id_list:
             try:
                 torn_id = int(id_str)
-                if storage.remove_target(interaction.user.id, torn_id):
+                if await storage.remove_target(interaction.user.id, torn_id):
                     removed.append(str(torn_id))
                 else:
                     not_found.append(str(torn_id))
@@ -247,56 +254,64 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
     @tree.command(name="targets_clear", description="remove all targets from your list")
     async def targets_clear(interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
-        count = storage.clear_targets(interaction.user.id)
+        count = await storage.clear_targets(interaction.user.id)
         await interaction.followup.send(f"cleared {count} targets" if count else "you don't have any targets")
 
     @tree.command(name="targets", description="show your target list with live stats")
     async def targets(interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
 
-        api_key = storage.get_key(interaction.user.id)
+        api_key = await storage.get_key(interaction.user.id)
         if not api_key:
             await interaction.followup.send("you need to set your api key first with /setapi", ephemeral=True)
             return
 
-        target_ids = storage.get_targets(interaction.user.id)
+        target_ids = await storage.get_targets(interaction.user.id)
         if not target_ids:
             await interaction.followup.send("you don't have any targets, add some with /targets_add")
             return
 
-        rows = []
-        timeout = aiohttp.ClientTimeout(total=20)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            for torn_id in target_ids:
-                try:
-                    profile_data = await fetch_torn_api("user", "profile", api_key, torn_id)
-
-                    stats_url = f"{TORN_API_BASE}/user/{torn_id}"
-                    stats_params = {
-                        "selections": "personalstats",
-                        "stat": "xantaken,refills,statenhancersused,energydrinkused",
-                        "key": api_key
-                    }
-                    async with session.get(stats_url, params=stats_params) as resp:
-                        stats_data = await resp.json()
-
-                    pstats = stats_data.get("personalstats", {}) or {}
-
-                    name = profile_data.get("name", "Unknown")
-                    level = profile_data.get("level", 0)
-                    age = profile_data.get("age", 0)
+        sem = asyncio.Semaphore(TARGET_FETCH_CONCURRENCY)
 
-                    status_state = (profile_data.get("status") or {}).get("state", "?")
-                    life = profile_data.get("life", {}) or {}
+        async def fetch_row(torn_id: int) -> dict:
+            async with sem:
+                try:
+                    try:
+                        data = await fetch_torn_api(
+                            "user",
+                            "profile,personalstats",
+                            api_key,
+                            torn_id,
+                            extra_params={"stat": "xantaken,refills,statenhancersused,energydrinkused"},
+                        )
+                        pstats = data.get("personalstats", {}) or {}
+                    except TornAPIError as e:
+                        # personalstats can be refused where the profile
+                        # isn't, the row still shows without the stats.
+                        # anything else already went through the retries
+                        if e.code not in STATS_REFUSED_CODES:
+                            raise
+                        data = await fetch_torn_api("user", "profile", api_key, torn_id)
+                        pstats = None
+
+                    name = data.get("name", "Unknown")
+                    level = data.get("level", 0)
+                    age = data.get("age", 0)
+
+                    status_state = (data.get("status") or {}).get("state", "?")
+                    life = data.get("life", {}) or {}
                     life_current = life.get("current", 0)
                     life_max = life.get("maximum", 0)
 
-                    last_rel = (profile_data.get("last_action") or {}).get("relative", "?")
+                    last_rel = (data.get("last_action") or {}).get("relative", "?")
 
-                    xanax = pstats.get("xantaken", 0) or 0
-                    refills = pstats.get("refills", 0) or 0
-                    se_used = pstats.get("statenhancersused", 0) or 0
-                    ecans = pstats.get("energydrinkused", 0) or 0
+                    if pstats is None:
+                        xanax = refills = se_used = ecans = "?"
+                    else:
+                        xanax = pstats.get("xantaken", 0) or 0
+                        refills = pstats.get("refills", 0) or 0
+                        se_used = pstats.get("statenhancersused", 0) or 0
+                        ecans = pstats.get("energydrinkused", 0) or 0
 
                     status_icon = {
                         "Okay": "OK",
@@ -305,7 +320,7 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
                         "Traveling": "TRVL"
                     }.get(status_state, "?")
 
-                    rows.append({
+                    return {
                         "name": name,
                         "id": torn_id,
                         "lvl": level,
@@ -317,10 +332,10 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
                         "ecan": ecans,
                         "se": se_used,
                         "last": last_rel
-                    })
+                    }
 
                 except Exception:
-                    rows.append({
+                    return {
                         "name": "???",
                         "id": torn_id,
                         "lvl": "?",
@@ -332,7 +347,9 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
                         "ecan": "?",
                         "se": "?",
                         "last": "error"
-                    })
+                    }
+
+        rows = await asyncio.gather(*(fetch_row(t) for t in target_ids))
 
         header = "```\n"
         header += f"{'NAME':<15} {'LVL':>4} {'AGE':>5} {'ST':>4} {'LIFE':>11} {'XAN':>5} {'REF':>4} {'ECAN':>5} {'LAST':<12}\n"
@@ -369,7 +386,7 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
     ):
         await interaction.response.defer(ephemeral=False)
 
-        api_key = storage.get_key(interaction.user.id)
+        api_key = await storage.get_key(interaction.user.id)
         if not api_key:
             await interaction.followup.send("you need to set your api key first with /setapi", ephemeral=True)
             return
@@ -383,11 +400,12 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
         try:
             data = await fetch_torn_api("user", "basic", api_key, torn_id)
             player_name = data.get("name", "Unknown")
+            await run_db(record_names, {torn_id: data.get("name")})
         except Exception as e:
             await interaction.followup.send(f"couldn't fetch player data - {e}", ephemeral=True)
             return
 
-        result = storage.add_vip_target(torn_id, clean_notes)
+        result = await storage.add_vip_target(torn_id, clean_notes)
         if result == "added":
             await interaction.followup.send(f"added to shared VIP list: {player_name} [{torn_id}]")
         elif result == "updated":
@@ -400,7 +418,7 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
     async def vip_targets_remove(interaction: discord.Interaction, torn_id: int):
         await interaction.response.defer(ephemeral=False)
 
-        if storage.remove_vip_target(torn_id):
+        if await storage.remove_vip_target(torn_id):
             await interaction.followup.send(f"removed from shared VIP list: {torn_id}")
         else:
             await interaction.followup.send(f"not in shared VIP list: {torn_id}")
@@ -409,17 +427,16 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
     async def vip_targets_list(interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
 
-        api_key = storage.get_key(interaction.user.id)
+        api_key = await storage.get_key(interaction.user.id)
         if not api_key:
             await interaction.followup.send("you need to set your api key first with /setapi", ephemeral=True)
             return
 
-        vip_targets = storage.get_vip_targets()
+        vip_targets = await storage.get_vip_targets()
         if not vip_targets:
             await interaction.followup.send("no shared VIP targets yet, add some with /vip_targets add")
             return
 
-        rows = []
         medals_by_id = {}
         try:
             torn_medals = await fetch_torn_api("torn", "medals", api_key)
@@ -427,47 +444,58 @@ def setup_targets_commands(tree: app_commands.CommandTree, storage: KeyStorage):
         except Exception:
             medals_by_id = {}
 
-        for torn_id, notes in vip_targets:
-            try:
-                profile_data = await fetch_torn_api("user", "profile,medals", api_key, torn_id)
-                name = profile_data.get("name", "Unknown")
-                level = profile_data.get("level", 0)
-                age = profile_data.get("age", 0)
-                last_rel = (profile_data.get("last_action") or {}).get("relative", "?")
-                medal_ids = profile_data.get("medals_awarded", []) or []
-                badge_name, badge_amount = _highest_networth_medal(medal_ids, medals_by_id)
-                if medal_ids and not medals_by_id:
+        sem = asyncio.Semaphore(TARGET_FETCH_CONCURRENCY)
+
+        async def fetch_vip_row(torn_id: int, notes) -> dict:
+            async with sem:
+                try:
+                    profile_data = await fetch_torn_api(
+                        "user",
+                        "profile,medals",
+                        api_key,
+                        torn_id,
+                        pooled=True,
+                    )
+                    name = profile_data.get("name", "Unknown")
+                    level = profile_data.get("level", 0)
+                    age = profile_data.get("age", 0)
+                    last_rel = (profile_data.get("last_action") or {}).get("relative", "?")
+                    medal_ids = profile_data.get("medals_awarded", []) or []
+                    badge_name, badge_amount = _highest_networth_medal(medal_ids, medals_by_id)
+                    if medal_ids and not medals_by_id:
+                        badge_text = "?"
+                    elif not badge_name:
+                        badge_text = "-"
+                    elif badge_amount is None:
+                        badge_text = badge_name
+                    else:
+                        badge_text = f"{badge_name} ({_format_amount_short(badge_amount)})"
+                    networth_sort = _networth_sort_key(badge_name, badge_amount)
+                except Exception:
+                    name = "???"
+                    level = "?"
+                    age = "?"
+                    last_rel = "error"
                     badge_text = "?"
-                elif not badge_name:
-                    badge_text = "-"
-                elif badge_amount is None:
-                    badge_text = badge_name
-                else:
-                    badge_text = f"{badge_name} ({_format_amount_short(badge_amount)})"
-                networth_sort = _networth_sort_key(badge_name, badge_amount)
-            except Exception:
-                name = "???"
-                level = "?"
-                age = "?"
-                last_rel = "error"
-                badge_text = "?"
-                networth_sort = (0, -1)
-
-            name_id = f"{name} [{torn_id}]"
-            last = last_rel
-            note = notes or "-"
-
-            rows.append({
-                "name": name_id,
-                "id": torn_id,
-                "lvl": level,
-                "age": age,
-                "badge": badge_text,
-                "last": last,
-                "notes": note,
-                "networth_sort": networth_sort,
-                "age_sort": _to_int(age, -1),
-            })
+                    networth_sort = (0, -1)
+
+                name_id = f"{name} [{torn_id}]"
+                last = last_rel
+                note = notes or "-"
+
+                return {
+                    "name": name_id,
+                    "id": torn_id,
+                    "lvl": level,
+                    "age": age,
+                    "badge": badge_text,
+                    "last": last,
+                    "notes": note,
+                    "networth_sort": networth_sort,
+                    "age_sort": _to_int(age, -1),
+                }
+
+        rows = await asyncio.gather(*(fetch_vip_row(t, n) for t, n in vip_targets))
 
         rows.sort(
             key=lambda r: (r["networth_sort"][0], r["networth_sort"][1], r["age_sort"]),
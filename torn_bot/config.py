@@ -10,7 +10,8 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "").strip()
 
-TORN_API_BASE = "https://api.torn.com"
+TORN_API_BASE = os.getenv("TORN_API_BASE", "https://api.torn.com").strip().rstrip("/")
+TORN_V2_BASE = os.getenv("TORN_V2_BASE", f"{TORN_API_BASE}/v2").strip().rstrip("/")
 
 DATABASE_PATH = str(DATA_DIR / "torn_keys.db")
 
@@ -33,16 +34,28 @@ def _int_env(name: str, default: int) -> int:
         return default
 
 
+TORN_RATE_LIMIT_PER_MIN = _int_env("TORN_RATE_LIMIT_PER_MIN", 100)
+API_CACHE_MAX_ENTRIES = _int_env("API_CACHE_MAX_ENTRIES", 2000)
+API_CACHE_PERSIST = _int_env("API_CACHE_PERSIST", 1)
+NAME_CACHE_MAX_ENTRIES = _int_env("NAME_CACHE_MAX_ENTRIES", 5000)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1").strip()
+METRICS_PORT = _int_env("METRICS_PORT", 0)
+
 FACTION_LEADERBOARD_CHANNEL_ID = _int_env(
     "FACTION_LEADERBOARD_CHANNEL_ID",
     1459194617139564636,
 )
 
+LEADERBOARD_SYNC_INTERVAL_S = max(15, _int_env("LEADERBOARD_SYNC_INTERVAL_S", 60))
+BACKFILL_WINDOWS = max(1, _int_env("BACKFILL_WINDOWS", 1))
+FACTION_SYNC_CONCURRENCY = max(1, _int_env("FACTION_SYNC_CONCURRENCY", 4))
+
 DAILY_LEADERBOARD_HOUR = _int_env("DAILY_LEADERBOARD_HOUR", 23)
 DAILY_LEADERBOARD_MINUTE = _int_env("DAILY_LEADERBOARD_MINUTE", 55)
 
 FLIGHT_ALERT_CHANNEL_ID = _int_env("FLIGHT_ALERT_CHANNEL_ID", 1198410711198605534)
 FLIGHT_CHECK_INTERVAL_S = _int_env("FLIGHT_CHECK_INTERVAL_S", 60)
+FLIGHT_IDLE_INTERVAL_S = _int_env("FLIGHT_IDLE_INTERVAL_S", 600)
 FLIGHT_API_KEY = os.getenv("FLIGHT_API_KEY", "").strip()
 FLIGHT_IDS_FILE = os.getenv(
     "FLIGHT_IDS_FILE",
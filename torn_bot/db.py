@@ -1,4 +1,12 @@
+import asyncio
+import functools
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar
+
 from torn_bot.config import DATABASE_PATH
 
 SCHEMA = """
@@ -8,6 +16,11 @@ CREATE TABLE IF NOT EXISTS api_keys (
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE TABLE IF NOT EXISTS key_pool (
+  discord_id INTEGER PRIMARY KEY,
+  enrolled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS targets (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   discord_id INTEGER NOT NULL,
@@ -31,8 +44,29 @@ CREATE TABLE IF NOT EXISTS global_keys (
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+{faction_tables}
+
+CREATE TABLE IF NOT EXISTS api_cache (
+  cache_key TEXT PRIMARY KEY,
+  body TEXT NOT NULL,
+  expires_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS player_names (
+  torn_id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  last_seen INTEGER NOT NULL
+);
+
+"""
+
+# every leaderboard table is keyed by faction first so each faction's rows
+# sit together and ingest cost doesn't grow with the number of factions
+FACTION_TABLES = {
+    "faction_attacks_seen": """
 CREATE TABLE IF NOT EXISTS faction_attacks_seen (
-  attack_id INTEGER PRIMARY KEY,
+  faction_id INTEGER NOT NULL DEFAULT 0,
+  attack_id INTEGER NOT NULL,
   attacker_id INTEGER NOT NULL,
   started INTEGER NOT NULL,
   ended INTEGER,
@@ -42,43 +76,213 @@ CREATE TABLE IF NOT EXISTS faction_attacks_seen (
   attacker_name TEXT,
   defender_id INTEGER,
   defender_name TEXT,
-  raw_json TEXT
-);
-
+  raw_json TEXT,
+  mugged REAL,
+  raw_z BLOB,
+  chain INTEGER,
+  fair_fight REAL,
+  is_stealthed INTEGER,
+  is_raid INTEGER,
+  is_ranked_war INTEGER,
+  is_interrupted INTEGER,
+  PRIMARY KEY (faction_id, attack_id)
+);""",
+    "faction_leaderboard_totals": """
 CREATE TABLE IF NOT EXISTS faction_leaderboard_totals (
-  attacker_id INTEGER PRIMARY KEY,
+  faction_id INTEGER NOT NULL DEFAULT 0,
+  attacker_id INTEGER NOT NULL,
   attacks INTEGER NOT NULL DEFAULT 0,
   mugs INTEGER NOT NULL DEFAULT 0,
   hosp INTEGER NOT NULL DEFAULT 0,
   respect_gain REAL NOT NULL DEFAULT 0,
   respect_loss REAL NOT NULL DEFAULT 0,
   mugged REAL NOT NULL DEFAULT 0,
-  best_mug REAL NOT NULL DEFAULT 0
-);
-
+  best_mug REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (faction_id, attacker_id)
+);""",
+    "faction_rollup_hourly": """
+CREATE TABLE IF NOT EXISTS faction_rollup_hourly (
+  faction_id INTEGER NOT NULL DEFAULT 0,
+  bucket_start INTEGER NOT NULL,
+  attacker_id INTEGER NOT NULL,
+  attacks INTEGER NOT NULL DEFAULT 0,
+  mugs INTEGER NOT NULL DEFAULT 0,
+  hosp INTEGER NOT NULL DEFAULT 0,
+  respect_gain REAL NOT NULL DEFAULT 0,
+  respect_loss REAL NOT NULL DEFAULT 0,
+  mugged REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (faction_id, bucket_start, attacker_id)
+) WITHOUT ROWID;""",
+    "faction_rollup_daily": """
+CREATE TABLE IF NOT EXISTS faction_rollup_daily (
+  faction_id INTEGER NOT NULL DEFAULT 0,
+  day_start INTEGER NOT NULL,
+  attacker_id INTEGER NOT NULL,
+  attacks INTEGER NOT NULL DEFAULT 0,
+  mugs INTEGER NOT NULL DEFAULT 0,
+  hosp INTEGER NOT NULL DEFAULT 0,
+  respect_gain REAL NOT NULL DEFAULT 0,
+  respect_loss REAL NOT NULL DEFAULT 0,
+  mugged REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY (faction_id, day_start, attacker_id)
+) WITHOUT ROWID;""",
+    "faction_leaderboard_meta": """
 CREATE TABLE IF NOT EXISTS faction_leaderboard_meta (
-  key TEXT PRIMARY KEY,
-  value TEXT NOT NULL
-);
+  faction_id INTEGER NOT NULL DEFAULT 0,
+  key TEXT NOT NULL,
+  value TEXT,
+  PRIMARY KEY (faction_id, key)
+);""",
+}
 
-CREATE INDEX IF NOT EXISTS idx_faction_attacks_seen_started
-  ON faction_attacks_seen (started);
+SCHEMA = SCHEMA.replace("{faction_tables}", "\n".join(FACTION_TABLES.values()))
+
+# created after the column migration since the covering index names
+# columns that older databases only gain through ALTER TABLE
+INDEXES = """
+DROP INDEX IF EXISTS idx_faction_attacks_seen_started;
+DROP INDEX IF EXISTS idx_faction_attacks_seen_window;
+CREATE INDEX IF NOT EXISTS idx_faction_attacks_seen_faction_window
+  ON faction_attacks_seen (faction_id, started, attacker_id, result, respect_gain, respect_loss, mugged);
 CREATE INDEX IF NOT EXISTS idx_faction_attacks_seen_attacker
   ON faction_attacks_seen (attacker_id);
 """
 
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+T = TypeVar("T")
+
+_CONN: sqlite3.Connection | None = None
+_LOCK = threading.RLock()
+_SCHEMA_READY = False
+_DEPTH = 0
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        check_same_thread=False,
+        cached_statements=256,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-16000")
+    conn.execute("PRAGMA mmap_size=268435456")
     return conn
 
 
-def init_db() -> None:
+def get_conn() -> sqlite3.Connection:
+    """
+    the process wide connection, opened once. don't close it, use
+    transaction() for anything that writes
+
+    """
+    global _CONN
+    if _CONN is None:
+        with _LOCK:
+            if _CONN is None:
+                _CONN = _connect()
+    return _CONN
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    holds the connection lock, commits on success and rolls back on error.
+    nested calls join the outer transaction
+
+    """
+    global _DEPTH
     conn = get_conn()
-    conn.executescript(SCHEMA)
-    existing_cols = {
-        row[1] for row in conn.execute("PRAGMA table_info(faction_attacks_seen)")
-    }
+    with _LOCK:
+        _DEPTH += 1
+        try:
+            yield conn
+        except BaseException:
+            if _DEPTH == 1:
+                conn.rollback()
+            raise
+        else:
+            if _DEPTH == 1:
+                conn.commit()
+        finally:
+            _DEPTH -= 1
+
+
+# every query from async code runs here so the event loop never waits on
+# disk, one worker keeps writes ordered and the connection single threaded
+_DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="torn-db")
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DB_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+
+def close_db() -> None:
+    global _CONN
+    _DB_EXECUTOR.shutdown(wait=True)
+    with _LOCK:
+        if _CONN is None:
+            return
+        try:
+            _CONN.execute("PRAGMA optimize")
+            _CONN.commit()
+        finally:
+            _CONN.close()
+            _CONN = None
+
+
+def _statements(script: str) -> list[str]:
+    return [stmt.strip() for stmt in script.split(";") if stmt.strip()]
+
+
+def _table_cols(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _finish_legacy_copy(conn: sqlite3.Connection, table: str) -> None:
+    """
+    an older, non atomic migration could stop after renaming a table to
+    {table}_legacy, leaving its rows beside an empty rebuilt table. they're
+    copied in under faction 0 like a normal migration would have
+
+    """
+    legacy_cols = _table_cols(conn, f"{table}_legacy")
+    if not legacy_cols:
+        return
+    cols = [c for c in legacy_cols if c in set(_table_cols(conn, table)) and c != "faction_id"]
+    col_list = ", ".join(cols)
+    conn.execute(
+        f"INSERT OR IGNORE INTO {table} (faction_id, {col_list}) SELECT 0, {col_list} FROM {table}_legacy"
+    )
+    conn.execute(f"DROP TABLE {table}_legacy")
+
+
+def _add_faction_column(conn: sqlite3.Connection, table: str, ddl: str) -> None:
+    """
+    single faction databases predate faction_id, which is part of the
+    primary key so the table is rebuilt. their rows land under faction 0
+    until the primary faction key claims them
+
+    """
+    cols = _table_cols(conn, table)
+    if "faction_id" in cols:
+        return
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    conn.execute(ddl)
+    col_list = ", ".join(cols)
+    conn.execute(f"INSERT INTO {table} (faction_id, {col_list}) SELECT 0, {col_list} FROM {table}_legacy")
+    conn.execute(f"DROP TABLE {table}_legacy")
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    for stmt in _statements(SCHEMA):
+        conn.execute(stmt)
+    for table in FACTION_TABLES:
+        _finish_legacy_copy(conn, table)
+    existing_cols = set(_table_cols(conn, "faction_attacks_seen"))
     missing = [
         ("ended", "INTEGER"),
         ("result", "TEXT"),
@@ -88,9 +292,62 @@ def init_db() -> None:
         ("defender_id", "INTEGER"),
         ("defender_name", "TEXT"),
         ("raw_json", "TEXT"),
+        ("mugged", "REAL"),
+        ("raw_z", "BLOB"),
+        ("chain", "INTEGER"),
+        ("fair_fight", "REAL"),
+        ("is_stealthed", "INTEGER"),
+        ("is_raid", "INTEGER"),
+        ("is_ranked_war", "INTEGER"),
+        ("is_interrupted", "INTEGER"),
     ]
     for col, col_type in missing:
         if col not in existing_cols:
             conn.execute(f"ALTER TABLE faction_attacks_seen ADD COLUMN {col} {col_type}")
-    conn.commit()
-    conn.close()
+    for table, ddl in FACTION_TABLES.items():
+        _add_faction_column(conn, table, ddl)
+    for stmt in _statements(INDEXES):
+        conn.execute(stmt)
+
+
+def init_db() -> None:
+    """
+    creates and migrates the schema in one explicit transaction. the
+    sqlite3 module doesn't open one for DDL and executescript commits
+    first, so without this a failed table rebuild left half a migration
+
+    """
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    conn = get_conn()
+    with _LOCK:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _migrate(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    _SCHEMA_READY = True
+
+
+def vacuum() -> None:
+    """
+    rewrites the file to hand freed pages back to the filesystem. holds the
+    connection lock for the whole run so no other query lands mid vacuum,
+    it can take a while on a big database
+
+    """
+    conn = get_conn()
+    with _LOCK:
+        if _DEPTH:
+            raise RuntimeError("vacuum can't run inside a transaction")
+        if conn.in_transaction:
+            conn.commit()
+        print("[db] vacuum started")
+        started = time.monotonic()
+        conn.execute("VACUUM")
+        print(f"[db] vacuum done in {time.monotonic() - started:.1f}s")
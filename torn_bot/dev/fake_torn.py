@@ -0,0 +1,478 @@
+"""
+local stand-in for the parts of the torn api the bot uses
+
+    python -m torn_bot.dev.fake_torn --port 8099 --latency-ms 150
+
+then run the bot (or a benchmark) with
+TORN_API_BASE=http://127.0.0.1:8099 TORN_V2_BASE=http://127.0.0.1:8099/v2
+
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+RESULTS = [
+    ("Attacked", 50),
+    ("Hospitalized", 25),
+    ("Mugged", 15),
+    ("Lost", 6),
+    ("Assist", 4),
+]
+DESTINATIONS = [
+    ("Mexico", 26 * 60),
+    ("Cayman Islands", 35 * 60),
+    ("Canada", 41 * 60),
+    ("Hawaii", 134 * 60),
+    ("United Kingdom", 159 * 60),
+    ("Argentina", 167 * 60),
+    ("Switzerland", 175 * 60),
+    ("Japan", 225 * 60),
+    ("China", 242 * 60),
+    ("UAE", 271 * 60),
+    ("South Africa", 297 * 60),
+]
+# status plane_image_type and its share of the standard flight time
+PLANES = [
+    ("airliner", 1.0),
+    ("light_aircraft", 0.7),
+    ("private_jet", 0.5),
+    ("airliner_business", 0.3),
+]
+BAD_KEY = "bad"
+
+
+class FakeTornData:
+    """
+    deterministic synthetic faction: members, a history of attacks with
+    increasing ids, per player profiles and a medal catalogue
+
+    """
+
+    def __init__(
+        self,
+        *,
+        seed: int = 1,
+        faction_id: int = 9001,
+        members: int = 60,
+        attacks: int = 20000,
+        days: int = 60,
+        now: Optional[int] = None,
+    ):
+        self.rng = random.Random(seed)
+        self.faction_id = faction_id
+        self.faction_name = f"Fake Faction {faction_id}"
+        self.now = int(now or time.time())
+        self.member_ids = [100000 + i for i in range(members)]
+        self.attacks: List[Dict[str, Any]] = []
+        self._next_attack_id = 1_000_000
+        self._generate_attacks(attacks, self.now - days * 86400, self.now)
+        self.medals = self._generate_medals()
+
+    def name_for(self, torn_id: int) -> str:
+        return f"player{torn_id}"
+
+    def _generate_attacks(self, count: int, start: int, end: int) -> None:
+        results = [r for r, _ in RESULTS]
+        weights = [w for _, w in RESULTS]
+        times = sorted(self.rng.randint(start, end) for _ in range(count))
+        for started in times:
+            self._append_attack(started, self.rng.choices(results, weights)[0])
+
+    def _append_attack(self, started: int, result: str) -> Dict[str, Any]:
+        attacker_id = self.rng.choice(self.member_ids)
+        defender_id = self.rng.randint(1, 3_000_000)
+        won = result not in ("Lost", "Assist")
+        attack = {
+            "id": self._next_attack_id,
+            "code": f"{self._next_attack_id:x}",
+            "started": started,
+            "ended": started + self.rng.randint(5, 240),
+            "attacker": {
+                "id": attacker_id,
+                "name": self.name_for(attacker_id),
+                "level": self.rng.randint(10, 100),
+                "faction": {"id": self.faction_id, "name": self.faction_name},
+            },
+            "defender": {
+                "id": defender_id,
+                "name": self.name_for(defender_id),
+                "level": self.rng.randint(1, 100),
+                "faction": None,
+            },
+            "result": result,
+            "respect_gain": round(self.rng.uniform(0.5, 12.0), 2) if won else 0,
+            "respect_loss": round(self.rng.uniform(0.5, 6.0), 2) if result == "Lost" else 0,
+            "chain": self.rng.randint(0, 250),
+            "is_interrupted": False,
+            "is_stealthed": self.rng.random() < 0.2,
+            "is_raid": False,
+            "is_ranked_war": self.rng.random() < 0.1,
+            "modifiers": {
+                "fair_fight": round(self.rng.uniform(1.0, 3.0), 2),
+                "war": 1,
+                "retaliation": 1,
+                "group": 1,
+                "overseas": 1,
+                "chain": 1,
+                "warlord": 1,
+            },
+        }
+        if result == "Mugged":
+            attack["money_mugged"] = self.rng.randint(10_000, 5_000_000)
+        self._next_attack_id += 1
+        self.attacks.append(attack)
+        return attack
+
+    def add_live_attacks(self, count: int) -> None:
+        now = int(time.time())
+        results = [r for r, _ in RESULTS]
+        weights = [w for _, w in RESULTS]
+        for _ in range(count):
+            self._append_attack(now, self.rng.choices(results, weights)[0])
+
+    def _generate_medals(self) -> Dict[str, Dict[str, Any]]:
+        medals: Dict[str, Dict[str, Any]] = {}
+        networth = [
+            ("Apprentice", 100_000),
+            ("Entrepreneur", 250_000),
+            ("Executive", 500_000),
+            ("Millionaire", 1_000_000),
+            ("Multimillionaire", 10_000_000),
+            ("Capitalist", 100_000_000),
+            ("Plutocrat", 1_000_000_000),
+        ]
+        for i, (name, amount) in enumerate(networth, start=1):
+            medals[str(i)] = {
+                "name": name,
+                "type": "NTW",
+                "description": f"Achieve a net worth of ${amount:,}",
+            }
+        for i in range(len(networth) + 1, 200):
+            medals[str(i)] = {"name": f"Medal {i}", "type": "OTR", "description": "Something"}
+        return medals
+
+    def status_for(self, torn_id: int) -> Dict[str, Any]:
+        # every fifth player is always mid trip, the cycle restarts each
+        # out + back round trip so landings happen while the server runs
+        if torn_id % 5:
+            return {"description": "Okay", "details": "", "state": "Okay", "color": "green", "until": 0}
+        dest, flight_s = DESTINATIONS[torn_id % len(DESTINATIONS)]
+        plane, mult = PLANES[(torn_id // 5) % len(PLANES)]
+        flight_s = int(flight_s * mult)
+        cycle = flight_s * 2 + 600
+        pos = (int(time.time()) + torn_id * 37) % cycle
+        if pos < flight_s:
+            return {
+                "description": f"Traveling to {dest}",
+                "details": "",
+                "state": "Traveling",
+                "color": "blue",
+                "until": 0,
+                "plane_image_type": plane,
+            }
+        if pos < flight_s + 600:
+            return {"description": f"In {dest}", "details": "", "state": "Abroad", "color": "blue", "until": 0}
+        return {
+            "description": f"Returning to Torn from {dest}",
+            "details": "",
+            "state": "Traveling",
+            "color": "blue",
+            "until": 0,
+            "plane_image_type": plane,
+        }
+
+    def last_action_for(self, torn_id: int) -> Dict[str, Any]:
+        ago = (torn_id * 7919) % (3 * 86400)
+        return {
+            "status": "Offline" if ago > 900 else "Online",
+            "timestamp": int(time.time()) - ago,
+            "relative": f"{ago // 3600} hours ago" if ago >= 3600 else f"{ago // 60} minutes ago",
+        }
+
+    def basic(self, torn_id: int) -> Dict[str, Any]:
+        return {
+            "player_id": torn_id,
+            "name": self.name_for(torn_id),
+            "level": torn_id % 100 + 1,
+            "gender": "Male" if torn_id % 2 else "Female",
+            "status": self.status_for(torn_id),
+        }
+
+    def profile(self, torn_id: int) -> Dict[str, Any]:
+        data = self.basic(torn_id)
+        data.update({
+            "rank": "Average Civilian",
+            "age": torn_id % 4000,
+            "awards": torn_id % 300,
+            "friends": torn_id % 50,
+            "enemies": torn_id % 20,
+            "life": {"current": 5000, "maximum": 5000},
+            "last_action": self.last_action_for(torn_id),
+            "job": {"job": "None", "company_name": None},
+            "faction": {
+                "faction_id": self.faction_id if torn_id in self.member_ids else 0,
+                "faction_name": self.faction_name if torn_id in self.member_ids else None,
+                "position": "Member" if torn_id in self.member_ids else "",
+            },
+        })
+        return data
+
+
+class FakeTornServer:
+    def __init__(
+        self,
+        data: FakeTornData,
+        *,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        rate_limit_per_min: int = 100,
+        error_rate: float = 0.0,
+        live_attacks_per_min: int = 0,
+    ):
+        self.data = data
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_per_min = rate_limit_per_min
+        self.error_rate = error_rate
+        self.live_attacks_per_min = live_attacks_per_min
+        self.request_count = 0
+        self._calls: Dict[str, deque] = {}
+        self._rng = random.Random(data.rng.random())
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/v2/faction/attacksfull", self.v2_attacksfull)
+        app.router.add_get("/v2/faction/members", self.v2_members)
+        app.router.add_get("/v2/faction/basic", self.v2_faction_basic)
+        app.router.add_get("/v2/user/{torn_id}/basic", self.v2_user_basic)
+        app.router.add_get("/user/", self.v1_user)
+        app.router.add_get("/user/{torn_id}", self.v1_user)
+        app.router.add_get("/faction/", self.v1_faction)
+        app.router.add_get("/torn/", self.v1_torn)
+        if self.live_attacks_per_min:
+            app.on_startup.append(self._start_live_attacks)
+        return app
+
+    async def _start_live_attacks(self, app: web.Application) -> None:
+        async def feed() -> None:
+            while True:
+                await asyncio.sleep(60)
+                self.data.add_live_attacks(self.live_attacks_per_min)
+
+        app["live_attacks"] = asyncio.create_task(feed())
+
+    @staticmethod
+    def _error(code: int, message: str) -> web.Response:
+        return web.json_response({"error": {"code": code, "error": message}})
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.request_count += 1
+        if self.latency_ms or self.jitter_ms:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            await asyncio.sleep(max(0.0, delay) / 1000.0)
+
+        key = request.query.get("key", "")
+        if not key:
+            return self._error(1, "Key is empty")
+        if key == BAD_KEY:
+            return self._error(2, "Incorrect key")
+
+        now = time.monotonic()
+        calls = self._calls.setdefault(key, deque())
+        while calls and now - calls[0] >= 60:
+            calls.popleft()
+        if self.rate_limit_per_min and len(calls) >= self.rate_limit_per_min:
+            return self._error(5, "Too many requests")
+        calls.append(now)
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            if self._rng.random() < 0.5:
+                return web.Response(status=503, headers={"Retry-After": "1"})
+            return self._error(17, "Backend error occurred, please try again")
+
+        return await handler(request)
+
+    @staticmethod
+    def _int_arg(request: web.Request, name: str) -> Optional[int]:
+        val = request.query.get(name)
+        if val is None or val == "":
+            return None
+        try:
+            return int(val)
+        except ValueError:
+            return None
+
+    async def v2_attacksfull(self, request: web.Request) -> web.Response:
+        limit = min(100, max(1, self._int_arg(request, "limit") or 100))
+        sort = request.query.get("sort", "DESC").upper()
+        from_ts = self._int_arg(request, "from")
+        to_ts = self._int_arg(request, "to")
+
+        rows = self.data.attacks
+        if from_ts is not None:
+            rows = [a for a in rows if a["started"] >= from_ts]
+        if to_ts is not None:
+            rows = [a for a in rows if a["started"] <= to_ts]
+        if sort == "DESC":
+            page = list(reversed(rows[-limit:]))
+        else:
+            page = rows[:limit]
+        return web.json_response({"attacks": page, "_metadata": {"links": {"prev": None, "next": None}}})
+
+    async def v2_members(self, request: web.Request) -> web.Response:
+        members = []
+        for tid in self.data.member_ids:
+            members.append({
+                "id": tid,
+                "name": self.data.name_for(tid),
+                "level": tid % 100 + 1,
+                "days_in_faction": tid % 900,
+                "position": "Member",
+                "last_action": self.data.last_action_for(tid),
+                "status": self.data.status_for(tid),
+            })
+        return web.json_response({"members": members})
+
+    async def v2_faction_basic(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "basic": {
+                "id": self.data.faction_id,
+                "name": self.data.faction_name,
+                "members": len(self.data.member_ids),
+            }
+        })
+
+    async def v2_user_basic(self, request: web.Request) -> web.Response:
+        try:
+            tid = int(request.match_info["torn_id"])
+        except ValueError:
+            return self._error(6, "Incorrect ID")
+        basic = self.data.basic(tid)
+        return web.json_response({
+            "profile": {
+                "id": tid,
+                "name": basic["name"],
+                "level": basic["level"],
+                "gender": basic["gender"],
+                "status": basic["status"],
+            }
+        })
+
+    async def v1_user(self, request: web.Request) -> web.Response:
+        raw_id = request.match_info.get("torn_id")
+        try:
+            tid = int(raw_id) if raw_id else self.data.member_ids[0]
+        except ValueError:
+            return self._error(6, "Incorrect ID")
+
+        out: Dict[str, Any] = {}
+        for sel in (request.query.get("selections") or "basic").split(","):
+            sel = sel.strip()
+            if sel == "basic":
+                out.update(self.data.basic(tid))
+            elif sel == "profile":
+                out.update(self.data.profile(tid))
+            elif sel == "personalstats":
+                out["personalstats"] = {
+                    "xantaken": tid % 1000,
+                    "refills": tid % 500,
+                    "statenhancersused": tid % 30,
+                    "energydrinkused": tid % 700,
+                }
+            elif sel == "medals":
+                out["medals_awarded"] = [m for m in range(1, 8) if tid % (m + 1)]
+            else:
+                return self._error(4, "Wrong fields")
+        return web.json_response(out)
+
+    async def v1_faction(self, request: web.Request) -> web.Response:
+        out: Dict[str, Any] = {}
+        for sel in (request.query.get("selections") or "basic").split(","):
+            sel = sel.strip()
+            if sel == "basic":
+                out.update({"ID": self.data.faction_id, "name": self.data.faction_name})
+            elif sel == "members":
+                out["members"] = {
+                    str(tid): {
+                        "name": self.data.name_for(tid),
+                        "level": tid % 100 + 1,
+                        "last_action": self.data.last_action_for(tid),
+                        "status": self.data.status_for(tid),
+                    }
+                    for tid in self.data.member_ids
+                }
+            else:
+                return self._error(4, "Wrong fields")
+        return web.json_response(out)
+
+    async def v1_torn(self, request: web.Request) -> web.Response:
+        selections = request.query.get("selections") or ""
+        if selections != "medals":
+            return self._error(4, "Wrong fields")
+        return web.json_response({"medals": self.data.medals})
+
+
+async def start_fake_torn(
+    host: str = "127.0.0.1",
+    port: int = 8099,
+    *,
+    data: Optional[FakeTornData] = None,
+    **server_opts: Any,
+) -> tuple[web.AppRunner, FakeTornServer]:
+    """
+    starts the stand-in inside the current loop, stop it with runner.cleanup()
+
+    """
+    server = FakeTornServer(data or FakeTornData(), **server_opts)
+    runner = web.AppRunner(server.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="local torn api stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--faction-id", type=int, default=9001)
+    parser.add_argument("--members", type=int, default=60)
+    parser.add_argument("--attacks", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=100, help="requests per key per minute, 0 for none")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503 / code 17")
+    parser.add_argument("--live-attacks", type=int, default=0, help="new attacks added per minute")
+    args = parser.parse_args()
+
+    data = FakeTornData(
+        seed=args.seed,
+        faction_id=args.faction_id,
+        members=args.members,
+        attacks=args.attacks,
+        days=args.days,
+    )
+    server = FakeTornServer(
+        data,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit_per_min=args.rate_limit,
+        error_rate=args.error_rate,
+        live_attacks_per_min=args.live_attacks,
+    )
+    print(f"fake torn api on http://{args.host}:{args.port} ({len(data.attacks)} attacks)")
+    web.run_app(server.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
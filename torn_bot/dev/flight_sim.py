@@ -0,0 +1,160 @@
+"""
+replays synthetic trips through the flight watch scheduler on a virtual
+clock and compares it with polling every id at a fixed interval
+
+    python -m torn_bot.dev.flight_sim --players 40 --hours 24 --unknown 0.2
+
+no api, discord or database is touched, only predict_landing and _schedule
+run. a landing counts as missed when no poll saw the return flight
+
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from torn_bot.config import FLIGHT_CHECK_INTERVAL_S
+from torn_bot.services import flight_watch as fw
+
+# (start, end, status, landing time or None)
+Segment = Tuple[float, float, Dict[str, Any], Optional[float]]
+
+
+def make_trips(rnd: random.Random, duration: float, unknown: float) -> List[Segment]:
+    """
+    back to back home, outbound, abroad and return segments. unknown is the
+    share of flights whose status carries no plane type
+
+    """
+    segments: List[Segment] = []
+    t = 0.0
+    destinations = list(fw.FLIGHT_MINUTES.items())
+    planes = list(fw.PLANE_MULTIPLIERS.items())
+    while t < duration:
+        home = rnd.randint(30 * 60, 4 * 3600)
+        dest, minutes = rnd.choice(destinations)
+        plane, mult = rnd.choice(planes)
+        flight_s = int(minutes * 60 * mult)
+        abroad = rnd.randint(5 * 60, 3600)
+        travel: Dict[str, Any] = {"state": "Traveling", "until": 0}
+        if rnd.random() >= unknown:
+            travel["plane_image_type"] = plane
+
+        segments.append((t, t + home, {"state": "Okay", "description": "Okay"}, None))
+        t += home
+        segments.append((t, t + flight_s, dict(travel, description=f"Traveling to {dest}"), None))
+        t += flight_s
+        segments.append((t, t + abroad, {"state": "Abroad", "description": f"In {dest}"}, None))
+        t += abroad
+        landing = t + flight_s
+        segments.append((t, landing, dict(travel, description=f"Returning to Torn from {dest}"), landing))
+        t = landing
+    return segments
+
+
+def status_at(segments: List[Segment], t: float) -> Dict[str, Any]:
+    for start, end, status, _ in segments:
+        if start <= t < end:
+            return status
+    return {"state": "Okay", "description": "Okay"}
+
+
+def _reset_scheduler() -> None:
+    for cache in (fw._LAST_STATE, fw._LAST_POLL, fw._NEXT_POLL, fw._FLIGHTS):
+        cache.clear()
+
+
+def adaptive_next(tid: int, tick: float, status: Dict[str, Any]) -> float:
+    # the same bookkeeping flight_watch_once does around _schedule
+    due = fw._schedule(tid, tick, status)
+    fw._LAST_POLL[tid] = tick
+    return due
+
+
+def fixed_next(tid: int, tick: float, status: Dict[str, Any]) -> float:
+    return tick + FLIGHT_CHECK_INTERVAL_S
+
+
+def simulate(
+    plans: Dict[int, List[Segment]],
+    duration: float,
+    next_poll: Callable[[int, float, Dict[str, Any]], float],
+) -> Dict[str, Any]:
+    """
+    polls every id when it's due and records when each landing was seen.
+    ticks never sit further apart than the watch loop's own cap
+
+    """
+    _reset_scheduler()
+    due = {tid: 0.0 for tid in plans}
+    last: Dict[int, Dict[str, Any]] = {}
+    seen: Dict[Tuple[int, float], float] = {}
+    fetches = 0
+    clock = 0.0
+    while clock < duration:
+        for tid in [t for t, at in due.items() if at <= clock]:
+            fetches += 1
+            status = status_at(plans[tid], clock)
+            prev = last.get(tid)
+            if (
+                prev is not None
+                and prev.get("state") == "Traveling"
+                and status.get("state") != "Traveling"
+                and fw._returning_to_torn(prev.get("description"))
+            ):
+                landing = max(
+                    (end for _, end, _, land in plans[tid] if land is not None and end <= clock),
+                    default=None,
+                )
+                if landing is not None:
+                    seen[(tid, landing)] = clock - landing
+            last[tid] = status
+            due[tid] = next_poll(tid, clock, status)
+        clock = min(min(due.values()), clock + max(10, FLIGHT_CHECK_INTERVAL_S))
+
+    # landings near either end depend on where the run started or stopped
+    landings = [
+        (tid, land)
+        for tid, segments in plans.items()
+        for _, _, _, land in segments
+        if land is not None and 3600 < land < duration - 3600
+    ]
+    latencies = sorted(seen[k] for k in landings if k in seen)
+    return {
+        "fetches": fetches,
+        "landings": len(landings),
+        "missed": len(landings) - len(latencies),
+        "latencies": latencies,
+    }
+
+
+def _pct(values: List[float], q: float) -> str:
+    if not values:
+        return "-"
+    return f"{values[min(len(values) - 1, int(len(values) * q))]:.0f}s"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--unknown", type=float, default=0.0, help="share of flights without a plane type")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    duration = args.hours * 3600
+    plans = {tid: make_trips(rnd, duration, args.unknown) for tid in range(1, args.players + 1)}
+
+    for label, next_poll in (("fixed", fixed_next), ("adaptive", adaptive_next)):
+        r = simulate(plans, duration, next_poll)
+        lat = r["latencies"]
+        print(
+            f"{label:<9} fetches {r['fetches']:>7}  landings {r['landings']:>4}  missed {r['missed']:>3}  "
+            f"p50 {_pct(lat, 0.5):>5}  p90 {_pct(lat, 0.9):>5}  max {_pct(lat, 1.0):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
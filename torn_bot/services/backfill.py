@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from torn_bot.api.rate_limit import request_priority, PRIORITY_BACKFILL
+from torn_bot.api.torn_v2 import fetch_torn_v2
+from torn_bot.config import BACKFILL_WINDOWS
+from torn_bot.db import run_db, transaction
+from torn_bot.services.faction_leaderboard_store import (
+    get_meta,
+    set_meta,
+    ensure_store_ready,
+    fetch_second,
+    ingest_attack_page,
+    note_tracked_since,
+)
+from torn_bot.services.factions import faction_keys
+
+
+PAGE_SIZE = 100
+IDLE_SLEEP_S = 60
+ERROR_SLEEP_S = 60
+
+_STATE_KEY = "backfill_state"
+
+
+def _load_state(faction_id: int) -> Optional[Dict[str, Any]]:
+    raw = get_meta(faction_id, _STATE_KEY)
+    return json.loads(raw) if raw else None
+
+
+def _save_state(faction_id: int, state: Dict[str, Any]) -> None:
+    """
+    checkpoint written after every page, alongside how far back the stored
+    attacks are unbroken so range queries know what they can trust
+
+    """
+    with transaction():
+        set_meta(faction_id, _STATE_KEY, json.dumps(state, separators=(",", ":")))
+        covered = contiguous_since(state)
+        if covered == 0:
+            set_meta(faction_id, "leaderboard_backfill_done", "1")
+        set_meta(faction_id, "leaderboard_covered_since", str(covered))
+
+
+def contiguous_since(state: Dict[str, Any]) -> int:
+    for w in sorted(state["windows"], key=lambda w: w["hi"], reverse=True):
+        if not w["done"]:
+            return w["to"]
+    return 0
+
+
+def _oldest_stored(faction_id: int) -> Optional[int]:
+    with transaction() as conn:
+        oldest = conn.execute(
+            "SELECT MIN(started) FROM faction_attacks_seen WHERE faction_id = ?",
+            (faction_id,),
+        ).fetchone()[0]
+        legacy_to = get_meta(faction_id, "leaderboard_backfill_to")
+    if oldest is None:
+        return None
+    if legacy_to:
+        oldest = min(oldest, int(legacy_to))
+    return int(oldest)
+
+
+def plan_windows(floor: int, top: int, count: int) -> List[Dict[str, Any]]:
+    """
+    splits [floor, top] into count equal windows, newest first. each is
+    walked newest to oldest with its own `to` cursor
+
+    """
+    count = max(1, count)
+    span = max(1, top - floor)
+    step = -(-span // count)
+    windows = []
+    hi = top
+    while hi > floor and len(windows) < count:
+        lo = max(floor, hi - step)
+        if len(windows) == count - 1:
+            lo = floor
+        windows.append({"lo": lo, "hi": hi, "to": hi, "done": False})
+        hi = lo - 1
+    if not windows:
+        windows.append({"lo": floor, "hi": top, "to": top, "done": True})
+    return windows
+
+
+class BackfillEngine:
+    """
+    walks faction attack history backwards on the backfill lane, so it only
+    spends tokens no interactive, daily or flight request is waiting for
+
+    """
+
+    def __init__(self, faction_id: int, windows: int = 1):
+        self.faction_id = faction_id
+        self.windows = windows
+        self.state: Optional[Dict[str, Any]] = None
+        self.pages = 0
+        self.added = 0
+        self.run_started_at: Optional[float] = None
+        self.covered_this_run = 0
+        self.last_error: Optional[str] = None
+        self.storage = None
+
+    async def _key_current(self, api_key: str) -> bool:
+        """
+        whether api_key is still the one tracking this faction. a walk can
+        run for hours, the key may be removed or replaced meanwhile
+
+        """
+        if self.storage is None:
+            return True
+        return dict(await faction_keys(self.storage)).get(self.faction_id) == api_key
+
+    async def _plan(self, api_key: str) -> Optional[Dict[str, Any]]:
+        state = await run_db(_load_state, self.faction_id)
+        if state is not None:
+            return state
+        if await run_db(get_meta, self.faction_id, "leaderboard_backfill_done") == "1":
+            return {"floor": 0, "windows": []}
+
+        top = await run_db(_oldest_stored, self.faction_id)
+        if top is None:
+            # nothing synced yet, the forward sync seeds the newest page
+            return None
+
+        with request_priority(PRIORITY_BACKFILL):
+            data = await fetch_torn_v2(
+                "/faction/attacksfull",
+                api_key=api_key,
+                params={"limit": 1, "sort": "ASC"},
+            )
+        attacks = data.get("attacks") or []
+        floor = int(attacks[0].get("started", 0) or 0) if attacks else top
+        state = {"floor": floor, "windows": plan_windows(floor, top, self.windows)}
+        await run_db(_save_state, self.faction_id, state)
+        return state
+
+    async def _step(self, api_key: str, window: Dict[str, Any]) -> None:
+        params = {"limit": PAGE_SIZE, "sort": "DESC", "from": window["lo"], "to": window["to"]}
+        with request_priority(PRIORITY_BACKFILL):
+            data = await fetch_torn_v2("/faction/attacksfull", api_key=api_key, params=params)
+        attacks = data.get("attacks") or []
+        self.pages += 1
+        await self._ingest(attacks)
+
+        prev_to = window["to"]
+        if len(attacks) < PAGE_SIZE:
+            window["to"] = window["lo"]
+            window["done"] = True
+        else:
+            oldest = min(int(a.get("started", 0) or 0) for a in attacks)
+            if oldest == prev_to:
+                # a full page inside one second, `to` can't get past it
+                # until the rest of that second is read from its other end
+                with request_priority(PRIORITY_BACKFILL):
+                    rest = await fetch_second(api_key, prev_to, attacks, "DESC", label=f"backfill {self.faction_id}")
+                await self._ingest(rest)
+                oldest = prev_to - 1
+            # `to` is inclusive, the next page starts over on the oldest
+            # second so one split across pages is still read whole
+            window["to"] = oldest
+            if window["to"] <= window["lo"]:
+                window["done"] = True
+        self.covered_this_run += prev_to - window["to"]
+        await run_db(_save_state, self.faction_id, self.state)
+
+    async def _ingest(self, attacks: list[dict]) -> None:
+        if not attacks:
+            return
+        page = await run_db(ingest_attack_page, self.faction_id, attacks)
+        self.added += page["added"]
+        if page["added_rows"]:
+            await run_db(note_tracked_since, self.faction_id, min(r["started"] for r in page["added_rows"]))
+
+    async def _walk(self, api_key: str, window: Dict[str, Any]) -> None:
+        while not window["done"]:
+            if not await self._key_current(api_key):
+                # progress is saved per page, the next run resumes it
+                return
+            await self._step(api_key, window)
+
+    async def run_once(self, api_key: str) -> bool:
+        """
+        backfills until every window is done, returns False when there was
+        nothing to do yet
+
+        """
+        await run_db(ensure_store_ready)
+        self.state = await self._plan(api_key)
+        if self.state is None:
+            return False
+        pending = [w for w in self.state["windows"] if not w["done"]]
+        if not pending:
+            return False
+        if self.run_started_at is None:
+            self.run_started_at = time.time()
+        await asyncio.gather(*(self._walk(api_key, w) for w in pending))
+        return True
+
+    async def run_forever(self, storage) -> None:
+        self.storage = storage
+        while True:
+            api_key = dict(await faction_keys(storage)).get(self.faction_id)
+            if not api_key:
+                await asyncio.sleep(IDLE_SLEEP_S)
+                continue
+            try:
+                worked = await self.run_once(api_key)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[backfill {self.faction_id}] failed: {e}")
+                await asyncio.sleep(ERROR_SLEEP_S)
+                continue
+            if not worked:
+                await asyncio.sleep(IDLE_SLEEP_S)
+
+    def status(self) -> Dict[str, Any]:
+        windows = list((self.state or {}).get("windows") or [])
+        total = sum(w["hi"] - w["lo"] for w in windows)
+        remaining = sum(w["to"] - w["lo"] for w in windows if not w["done"])
+        elapsed = time.time() - self.run_started_at if self.run_started_at else 0.0
+        rate = self.covered_this_run / elapsed if elapsed > 0 else 0.0
+        return {
+            "faction_id": self.faction_id,
+            "planned": self.state is not None,
+            "floor": (self.state or {}).get("floor"),
+            "windows": windows,
+            "done": self.state is not None and remaining == 0,
+            "progress": (1.0 - remaining / total) if total else 1.0,
+            "pages": self.pages,
+            "added": self.added,
+            "eta_s": (remaining / rate) if rate > 0 and remaining else None,
+            "last_error": self.last_error,
+        }
+
+
+_ENGINES: Dict[int, BackfillEngine] = {}
+_TASKS: Dict[int, "asyncio.Task[None]"] = {}
+
+
+def get_backfill(faction_id: int) -> BackfillEngine:
+    engine = _ENGINES.get(faction_id)
+    if engine is None:
+        engine = BackfillEngine(faction_id, BACKFILL_WINDOWS)
+        _ENGINES[faction_id] = engine
+    return engine
+
+
+def iter_backfills() -> List[BackfillEngine]:
+    return list(_ENGINES.values())
+
+
+def start_backfills(faction_ids: List[int], storage) -> None:
+    """
+    one worker task per tracked faction, started the first time it's seen
+    and restarted if it ever exits
+
+    """
+    for faction_id in faction_ids:
+        task = _TASKS.get(faction_id)
+        if task is None or task.done():
+            _TASKS[faction_id] = asyncio.create_task(get_backfill(faction_id).run_forever(storage))
+
+
+def stop_backfill(faction_id: int) -> None:
+    """
+    cancels the faction's worker, for when it stops being tracked
+
+    """
+    task = _TASKS.pop(faction_id, None)
+    if task is not None and not task.done():
+        task.cancel()
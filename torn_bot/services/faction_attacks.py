@@ -12,13 +12,17 @@ except Exception:
 from torn_bot.api.torn_v2 import fetch_torn_v2
 
 
-def london_day_start_utc_ts() -> int:
-    now_lon = datetime.now(tz=LONDON)
-    start_lon = now_lon.replace(hour=0, minute=0, second=0, microsecond=0)
+def london_day_start_for(ts: int) -> int:
+    dt_lon = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone(LONDON)
+    start_lon = dt_lon.replace(hour=0, minute=0, second=0, microsecond=0)
     start_utc = start_lon.astimezone(timezone.utc)
     return int(start_utc.timestamp())
 
 
+def london_day_start_utc_ts() -> int:
+    return london_day_start_for(int(datetime.now(timezone.utc).timestamp()))
+
+
 def fmt_time_london(ts: int) -> str:
     dt = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone(LONDON)
     return dt.strftime("%H:%M:%S")
@@ -1,354 +1,1033 @@
 from __future__ import annotations
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
+import heapq
 import json
+import time
+import zlib
 
-from torn_bot.db import get_conn, init_db
+from torn_bot.db import transaction, init_db, run_db, vacuum
 from torn_bot.api.torn_v2 import fetch_torn_v2
-from torn_bot.services.faction_attacks import fetch_faction_attacks_since
+from torn_bot.services.faction_attacks import london_day_start_for
+from torn_bot.services.leaderboard_index import LEADERBOARD_INDEX, METRICS as INDEX_METRICS
+from torn_bot.services.player_names import lookup_names, record_name_rows, seed_from_attacks
 
 
-RECENT_SYNC_LOOKBACK_SECONDS = 60 * 60
-RECENT_SYNC_PAGE_LIMIT = 3
-BACKFILL_PAGE_LIMIT = 3
+SYNC_PAGE_SIZE = 100
+SYNC_PAGE_LIMIT = 20
+# attacks are listed once they end, so a fight that started just before the
+# cursor can still show up later. re-reading this much behind it is cheap
+# because already stored rows are skipped without a write
+SYNC_CURSOR_OVERLAP_SECONDS = 5 * 60
+# the api pages by timestamp alone, so a second with a full page of attacks
+# is re-read from both ends, at most this many requests
+SECOND_PAGE_LIMIT = 4
 
 
-def _get_meta(key: str) -> Optional[str]:
-    conn = get_conn()
-    cur = conn.execute("SELECT value FROM faction_leaderboard_meta WHERE key = ?", (key,))
-    row = cur.fetchone()
-    conn.close()
+def get_meta(faction_id: int, key: str) -> Optional[str]:
+    with transaction() as conn:
+        cur = conn.execute(
+            "SELECT value FROM faction_leaderboard_meta WHERE faction_id = ? AND key = ?",
+            (faction_id, key),
+        )
+        row = cur.fetchone()
     if not row:
         return None
     return row[0]
 
 
-def _set_meta(key: str, value: str) -> None:
-    conn = get_conn()
-    conn.execute(
-        "INSERT OR REPLACE INTO faction_leaderboard_meta (key, value) VALUES (?, ?)",
-        (key, value),
-    )
-    conn.commit()
-    conn.close()
-
-
-def _apply_attack(
-    attacker_id: int,
-    started: int,
-    attack_id: int,
-    *,
-    ended: Optional[int],
-    result: Optional[str],
-    is_mug: int,
-    is_hosp: int,
-    respect_gain: float,
-    respect_loss: float,
-    mugged: float,
-    attacker_name: Optional[str],
-    defender_id: Optional[int],
-    defender_name: Optional[str],
-    raw_json: Optional[str],
-) -> bool:
-    conn = get_conn()
-    cur = conn.execute("SELECT 1 FROM faction_attacks_seen WHERE attack_id = ?", (attack_id,))
-    if cur.fetchone():
+def set_meta(faction_id: int, key: str, value: str) -> None:
+    with transaction() as conn:
         conn.execute(
-            """
-            UPDATE faction_attacks_seen
-            SET attacker_id = COALESCE(?, attacker_id),
-                started = COALESCE(?, started),
-                ended = COALESCE(?, ended),
-                result = COALESCE(?, result),
-                respect_gain = COALESCE(?, respect_gain),
-                respect_loss = COALESCE(?, respect_loss),
-                attacker_name = COALESCE(?, attacker_name),
-                defender_id = COALESCE(?, defender_id),
-                defender_name = COALESCE(?, defender_name),
-                raw_json = COALESCE(?, raw_json)
-            WHERE attack_id = ?
+            "INSERT OR REPLACE INTO faction_leaderboard_meta (faction_id, key, value) VALUES (?, ?, ?)",
+            (faction_id, key, value),
+        )
+
+
+_SEEN_COLUMNS = (
+    "attack_id",
+    "attacker_id",
+    "started",
+    "ended",
+    "result",
+    "respect_gain",
+    "respect_loss",
+    "attacker_name",
+    "defender_id",
+    "defender_name",
+    "raw_z",
+    "mugged",
+    "chain",
+    "fair_fight",
+    "is_stealthed",
+    "is_raid",
+    "is_ranked_war",
+    "is_interrupted",
+)
+
+# preset dictionary for zlib, shaped like an attacksfull entry so even a
+# single short payload compresses well. never edit it in place: stored
+# blobs carry the version byte of the dictionary they were packed with
+_RAW_ZDICT_V1 = (
+    b'"modifiers":{"fair_fight":1.0,"war":1,"retaliation":1,"group":1,"overseas":1,'
+    b'"chain":1,"warlord":1},"finishing_hit_effects":[],'
+    b'"is_interrupted":false,"is_stealthed":false,"is_raid":false,"is_ranked_war":false,'
+    b'"result":"Attacked","result":"Hospitalized","result":"Mugged","result":"Lost",'
+    b'"result":"Assist","result":"Escape","result":"Stalemate","result":"Interrupted",'
+    b'"result":"Timeout","result":"Special","result":"Arrested","result":"Looted",'
+    b'"respect_gain":0,"respect_loss":0,"chain":0,"money_mugged":'
+    b'"defender":{"id":1,"name":"","level":1,"faction":null},'
+    b'"attacker":{"id":1,"name":"","level":1,"faction":{"id":1,"name":""}},'
+    b'{"id":1,"code":"","started":1700000000,"ended":1700000000,'
+)
+_RAW_VERSION = 1
+_RAW_ZDICTS = {1: _RAW_ZDICT_V1}
+
+
+def _pack_raw(a: dict) -> bytes:
+    data = json.dumps(a, separators=(",", ":"), ensure_ascii=False).encode()
+    comp = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, _RAW_ZDICTS[_RAW_VERSION])
+    return bytes((_RAW_VERSION,)) + comp.compress(data) + comp.flush()
+
+
+def _unpack_raw(blob: bytes) -> dict:
+    decomp = zlib.decompressobj(-15, _RAW_ZDICTS[blob[0]])
+    return json.loads(decomp.decompress(blob[1:]) + decomp.flush())
+
+
+def _to_flag(val) -> Optional[int]:
+    if val is None:
+        return None
+    return 1 if val else 0
+
+_ROLLUP_FIELDS = ("attacks", "mugs", "hosp", "respect_gain", "respect_loss", "mugged")
+
+
+def _result_flags(result) -> tuple[int, int]:
+    res_l = str(result or "").lower()
+    return (1 if "mug" in res_l else 0), (1 if "hospital" in res_l else 0)
+
+
+def _to_float(x) -> float:
+    try:
+        return float(x or 0)
+    except Exception:
+        return 0.0
+
+
+def _to_int_or_none(x) -> Optional[int]:
+    try:
+        return int(x) if x is not None else None
+    except Exception:
+        return None
+
+
+def _to_float_or_none(x) -> Optional[float]:
+    try:
+        return float(x) if x is not None else None
+    except Exception:
+        return None
+
+
+def _clean_str(val) -> Optional[str]:
+    if val is None:
+        return None
+    if isinstance(val, str):
+        s = val.strip()
+        return s if s else None
+    return str(val)
+
+
+def _extract_mugged(a: dict) -> float:
+    mugged = 0.0
+    for key in ("money_mugged", "mugged", "money", "cash"):
+        if key not in a:
+            continue
+        val = a.get(key)
+        if isinstance(val, dict):
+            for sub in ("amount", "value", "money"):
+                if sub in val:
+                    mugged = _to_float(val.get(sub, 0))
+                    break
+        else:
+            mugged = _to_float(val)
+        if mugged:
+            break
+    return mugged
+
+
+def _parse_attack(a: dict) -> Optional[Dict[str, Any]]:
+    try:
+        attack_id = int(a.get("id", 0) or 0)
+        started = int(a.get("started", 0) or 0)
+        ended = int(a.get("ended", 0) or 0)
+        attacker = a.get("attacker") or {}
+        defender = a.get("defender") or {}
+        attacker_id = int(attacker.get("id", 0) or 0)
+        defender_id = int(defender.get("id", 0) or 0)
+    except Exception:
+        return None
+
+    if not attack_id or not attacker_id or not started:
+        return None
+
+    is_mug, is_hosp = _result_flags(a.get("result"))
+
+    return {
+        "attack_id": attack_id,
+        "attacker_id": attacker_id,
+        "started": started,
+        "ended": ended or None,
+        "result": _clean_str(a.get("result")),
+        "respect_gain": _to_float(a.get("respect_gain", 0)),
+        "respect_loss": _to_float(a.get("respect_loss", 0)),
+        "attacker_name": _clean_str(attacker.get("name")),
+        "defender_id": defender_id or None,
+        "defender_name": _clean_str(defender.get("name")),
+        "raw_z": _pack_raw(a),
+        "chain": _to_int_or_none(a.get("chain")),
+        "fair_fight": _to_float_or_none((a.get("modifiers") or {}).get("fair_fight")),
+        "is_stealthed": _to_flag(a.get("is_stealthed")),
+        "is_raid": _to_flag(a.get("is_raid")),
+        "is_ranked_war": _to_flag(a.get("is_ranked_war")),
+        "is_interrupted": _to_flag(a.get("is_interrupted")),
+        "is_mug": is_mug,
+        "is_hosp": is_hosp,
+        "mugged": _extract_mugged(a) if is_mug else 0.0,
+    }
+
+
+def _stored_row(faction_id: int, stored: tuple) -> Dict[str, Any]:
+    row = dict(zip(_SEEN_COLUMNS, stored))
+    row["faction_id"] = faction_id
+    row["is_mug"], row["is_hosp"] = _result_flags(row["result"])
+    for c in ("respect_gain", "respect_loss", "mugged"):
+        row[c] = float(row[c] or 0)
+    return row
+
+
+def _add_to_totals(totals: Dict[int, list], row: Dict[str, Any], sign: int = 1) -> None:
+    t = totals.setdefault(row["attacker_id"], [0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+    t[0] += sign
+    t[1] += sign * row["is_mug"]
+    t[2] += sign * row["is_hosp"]
+    t[3] += sign * row["respect_gain"]
+    t[4] += sign * row["respect_loss"]
+    t[5] += sign * row["mugged"]
+    if sign > 0:
+        t[6] = max(t[6], row["mugged"])
+
+
+def _add_to_rollups(
+    hourly: Dict[tuple, list],
+    daily: Dict[tuple, list],
+    row: Dict[str, Any],
+    sign: int = 1,
+) -> None:
+    started = row["started"]
+    values = (1, row["is_mug"], row["is_hosp"], row["respect_gain"], row["respect_loss"], row["mugged"])
+    for buckets, start in (
+        (hourly, started - started % 3600),
+        (daily, london_day_start_for(started)),
+    ):
+        b = buckets.setdefault((row["faction_id"], start, row["attacker_id"]), [0, 0, 0, 0.0, 0.0, 0.0])
+        for i, v in enumerate(values):
+            b[i] += sign * v
+
+
+def _upsert_rollups(conn, hourly: Dict[tuple, list], daily: Dict[tuple, list]) -> None:
+    for table, key_col, buckets in (
+        ("faction_rollup_hourly", "bucket_start", hourly),
+        ("faction_rollup_daily", "day_start", daily),
+    ):
+        if not buckets:
+            continue
+        conn.executemany(
+            f"""
+            INSERT INTO {table} (faction_id, {key_col}, attacker_id, {', '.join(_ROLLUP_FIELDS)})
+            VALUES (?, ?, ?, {', '.join('?' * len(_ROLLUP_FIELDS))})
+            ON CONFLICT(faction_id, {key_col}, attacker_id) DO UPDATE SET
+                {', '.join(f'{c} = {c} + excluded.{c}' for c in _ROLLUP_FIELDS)}
             """,
-            (
-                attacker_id,
-                started,
-                ended,
-                result,
-                respect_gain,
-                respect_loss,
-                attacker_name,
-                defender_id,
-                defender_name,
-                raw_json,
-                attack_id,
-            ),
+            [(*key, *b) for key, b in buckets.items()],
+        )
+        # a changed attack can move out of a bucket entirely
+        conn.executemany(
+            f"DELETE FROM {table} WHERE faction_id = ? AND {key_col} = ? AND attacker_id = ? AND attacks <= 0",
+            [key for key, b in buckets.items() if b[0] < 0],
         )
-        conn.commit()
-        conn.close()
-        return False
-
-    conn.execute(
-        """
-        INSERT INTO faction_attacks_seen
-            (
-                attack_id,
-                attacker_id,
-                started,
-                ended,
-                result,
-                respect_gain,
-                respect_loss,
-                attacker_name,
-                defender_id,
-                defender_name,
-                raw_json
+
+
+def rebuild_rollups() -> int:
+    """
+    recomputes both rollup tables from faction_attacks_seen, filling in the
+    mugged column for rows stored before it existed. returns rows scanned
+
+    """
+    scanned = 0
+    with transaction() as conn:
+        cur = conn.execute(
+            "SELECT faction_id, attack_id, raw_z, raw_json FROM faction_attacks_seen WHERE mugged IS NULL"
+        )
+        fills = []
+        for faction_id, attack_id, raw_z, raw in cur.fetchall():
+            try:
+                a = _unpack_raw(raw_z) if raw_z is not None else (json.loads(raw) if raw else {})
+            except Exception:
+                a = {}
+            is_mug, _ = _result_flags(a.get("result"))
+            fills.append((_extract_mugged(a) if is_mug else 0.0, faction_id, attack_id))
+        if fills:
+            conn.executemany(
+                "UPDATE faction_attacks_seen SET mugged = ? WHERE faction_id = ? AND attack_id = ?",
+                fills,
             )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            attack_id,
-            attacker_id,
-            started,
-            ended,
-            result,
-            respect_gain,
-            respect_loss,
-            attacker_name,
-            defender_id,
-            defender_name,
-            raw_json,
-        ),
-    )
 
-    conn.execute(
-        """
-        INSERT INTO faction_leaderboard_totals
-            (attacker_id, attacks, mugs, hosp, respect_gain, respect_loss, mugged, best_mug)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(attacker_id) DO UPDATE SET
-            attacks = attacks + excluded.attacks,
-            mugs = mugs + excluded.mugs,
-            hosp = hosp + excluded.hosp,
-            respect_gain = respect_gain + excluded.respect_gain,
-            respect_loss = respect_loss + excluded.respect_loss,
-            mugged = mugged + excluded.mugged,
-            best_mug = CASE
-                WHEN excluded.best_mug > best_mug THEN excluded.best_mug
-                ELSE best_mug
-            END
-        """,
-        (
-            attacker_id,
-            1,
-            int(is_mug),
-            int(is_hosp),
-            respect_gain,
-            respect_loss,
-            mugged,
-            mugged,
-        ),
-    )
-    conn.commit()
-    conn.close()
-    return True
+        conn.execute("DELETE FROM faction_rollup_hourly")
+        conn.execute("DELETE FROM faction_rollup_daily")
+        hourly: Dict[tuple, list] = {}
+        daily: Dict[tuple, list] = {}
+        cur = conn.execute(
+            "SELECT faction_id, attacker_id, started, result, respect_gain, respect_loss, mugged "
+            "FROM faction_attacks_seen"
+        )
+        for faction_id, attacker_id, started, result, rg, rl, mugged in cur:
+            is_mug, is_hosp = _result_flags(result)
+            _add_to_rollups(
+                hourly,
+                daily,
+                {
+                    "faction_id": faction_id,
+                    "attacker_id": attacker_id,
+                    "started": started,
+                    "is_mug": is_mug,
+                    "is_hosp": is_hosp,
+                    "respect_gain": float(rg or 0),
+                    "respect_loss": float(rl or 0),
+                    "mugged": float(mugged or 0),
+                },
+            )
+            scanned += 1
+        _upsert_rollups(conn, hourly, daily)
+    return scanned
+
+
+_TOTAL_FIELDS = _ROLLUP_FIELDS + ("best_mug",)
+
+
+def rebuild_totals() -> Dict[str, Any]:
+    """
+    recomputes faction_leaderboard_totals in one grouped scan of
+    faction_attacks_seen, rebuilds the rollups and reports how far the
+    incremental totals had drifted
+
+    """
+    with transaction() as conn:
+        # fills in missing mugged amounts first so the totals below see them
+        scanned = rebuild_rollups()
+        before = {
+            (r[0], r[1]): r[2:]
+            for r in conn.execute(
+                f"SELECT faction_id, attacker_id, {', '.join(_TOTAL_FIELDS)} FROM faction_leaderboard_totals"
+            )
+        }
+        after = {
+            (r[0], r[1]): r[2:]
+            for r in conn.execute(
+                """
+                SELECT faction_id, attacker_id,
+                    COUNT(*),
+                    SUM(CASE WHEN LOWER(COALESCE(result, '')) LIKE '%mug%' THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN LOWER(COALESCE(result, '')) LIKE '%hospital%' THEN 1 ELSE 0 END),
+                    COALESCE(SUM(respect_gain), 0),
+                    COALESCE(SUM(respect_loss), 0),
+                    COALESCE(SUM(mugged), 0),
+                    COALESCE(MAX(mugged), 0)
+                FROM faction_attacks_seen
+                GROUP BY faction_id, attacker_id
+                """
+            )
+        }
 
+        drift = dict.fromkeys(_TOTAL_FIELDS, 0.0)
+        drifted = 0
+        zero = (0,) * len(_TOTAL_FIELDS)
+        for key in before.keys() | after.keys():
+            old = before.get(key, zero)
+            new = after.get(key, zero)
+            diffs = [abs(float(n or 0) - float(o or 0)) for n, o in zip(new, old)]
+            if any(d > 1e-6 for d in diffs):
+                drifted += 1
+                for c, d in zip(_TOTAL_FIELDS, diffs):
+                    drift[c] += d
 
-async def sync_faction_attacks(api_key: str) -> Dict[str, Any]:
+        conn.execute("DELETE FROM faction_leaderboard_totals")
+        conn.executemany(
+            f"""
+            INSERT INTO faction_leaderboard_totals (faction_id, attacker_id, {', '.join(_TOTAL_FIELDS)})
+            VALUES (?, ?, {', '.join('?' * len(_TOTAL_FIELDS))})
+            """,
+            [(*key, *vals) for key, vals in after.items()],
+        )
+    LEADERBOARD_INDEX.invalidate()
+
+    return {
+        "attackers": len(after),
+        "drifted": drifted,
+        "drift": drift,
+        "scanned": scanned,
+    }
+
+
+def compact_raw_json(batch_size: int = 2000) -> int:
+    """
+    moves legacy plain text raw_json into compressed raw_z and fills the
+    promoted columns, a batch per transaction. returns rows converted
+
+    """
+    converted = 0
+    while True:
+        with transaction() as conn:
+            rows = conn.execute(
+                "SELECT faction_id, attack_id, raw_json FROM faction_attacks_seen "
+                "WHERE raw_json IS NOT NULL LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for faction_id, attack_id, raw in rows:
+                try:
+                    a = json.loads(raw)
+                except Exception:
+                    a = {}
+                modifiers = a.get("modifiers") or {}
+                updates.append((
+                    _pack_raw(a) if a else None,
+                    _to_int_or_none(a.get("chain")),
+                    _to_float_or_none(modifiers.get("fair_fight") if isinstance(modifiers, dict) else None),
+                    _to_flag(a.get("is_stealthed")),
+                    _to_flag(a.get("is_raid")),
+                    _to_flag(a.get("is_ranked_war")),
+                    _to_flag(a.get("is_interrupted")),
+                    faction_id,
+                    attack_id,
+                ))
+            conn.executemany(
+                """
+                UPDATE faction_attacks_seen SET
+                    raw_z = ?, chain = ?, fair_fight = ?, is_stealthed = ?,
+                    is_raid = ?, is_ranked_war = ?, is_interrupted = ?, raw_json = NULL
+                WHERE faction_id = ? AND attack_id = ?
+                """,
+                updates,
+            )
+            converted += len(updates)
+    return converted
+
+
+def load_raw_attack(faction_id: int, attack_id: int) -> Optional[dict]:
+    """
+    the attack exactly as torn returned it, decompressed on demand
+
+    """
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT raw_z, raw_json FROM faction_attacks_seen WHERE faction_id = ? AND attack_id = ?",
+            (faction_id, attack_id),
+        ).fetchone()
+    if not row:
+        return None
+    if row[0] is not None:
+        return _unpack_raw(row[0])
+    return json.loads(row[1]) if row[1] else None
+
+
+_STORE_READY = False
+
+
+def ensure_store_ready() -> None:
+    global _STORE_READY
+    if _STORE_READY:
+        return
     init_db()
+    with transaction() as conn:
+        has_attacks = conn.execute("SELECT 1 FROM faction_attacks_seen LIMIT 1").fetchone()
+        has_rollups = conn.execute("SELECT 1 FROM faction_rollup_daily LIMIT 1").fetchone()
+        if has_attacks and not has_rollups:
+            rebuild_rollups()
+        # live syncs record names themselves, the seed only fills the table
+        # the first time it exists next to attacks stored without it
+        if has_attacks and not conn.execute("SELECT 1 FROM player_names LIMIT 1").fetchone():
+            seed_from_attacks()
+    if compact_raw_json():
+        # the freed pages only go back to the filesystem on a vacuum
+        vacuum()
+    with transaction() as conn:
+        faction_ids = [r[0] for r in conn.execute("SELECT DISTINCT faction_id FROM faction_leaderboard_totals")]
+    for faction_id in faction_ids:
+        LEADERBOARD_INDEX.load(faction_id)
+    _STORE_READY = True
 
-    last_sync = _get_meta("leaderboard_last_sync_started")
-    since_utc = max(0, int(last_sync) - RECENT_SYNC_LOOKBACK_SECONDS) if last_sync else 0
-    added_samples: list[dict[str, Any]] = []
-    sample_limit = 5
 
-    def to_float(x) -> float:
-        try:
-            return float(x or 0)
-        except Exception:
-            return 0.0
+def claim_legacy_rows(faction_id: int) -> int:
+    """
+    hands rows stored before multi faction support (faction 0) to the
+    faction the primary key belongs to. returns attack rows moved
+
+    """
+    if not faction_id:
+        return 0
+    with transaction() as conn:
+        if not conn.execute("SELECT 1 FROM faction_attacks_seen WHERE faction_id = 0 LIMIT 1").fetchone():
+            return 0
+        has_own = conn.execute(
+            "SELECT 1 FROM faction_attacks_seen WHERE faction_id = ? LIMIT 1", (faction_id,)
+        ).fetchone()
+        if not has_own:
+            moved = conn.execute(
+                "UPDATE faction_attacks_seen SET faction_id = ? WHERE faction_id = 0",
+                (faction_id,),
+            ).rowcount
+            for table in ("faction_leaderboard_totals", "faction_rollup_hourly", "faction_rollup_daily"):
+                conn.execute(f"UPDATE {table} SET faction_id = ? WHERE faction_id = 0", (faction_id,))
+        else:
+            # something synced under the real id first. attacks both sets
+            # share are kept once and the aggregates are recounted, adding
+            # the two sets of totals together would count those twice
+            own_oldest = conn.execute(
+                "SELECT MIN(started) FROM faction_attacks_seen WHERE faction_id = ?", (faction_id,)
+            ).fetchone()[0]
+            cols = [r[1] for r in conn.execute("PRAGMA table_info(faction_attacks_seen)") if r[1] != "faction_id"]
+            col_list = ", ".join(cols)
+            moved = conn.execute(
+                f"INSERT OR IGNORE INTO faction_attacks_seen (faction_id, {col_list}) "
+                f"SELECT ?, {col_list} FROM faction_attacks_seen WHERE faction_id = 0",
+                (faction_id,),
+            ).rowcount
+            conn.execute("DELETE FROM faction_attacks_seen WHERE faction_id = 0")
+            for table in ("faction_leaderboard_totals", "faction_rollup_hourly", "faction_rollup_daily"):
+                conn.execute(f"DELETE FROM {table} WHERE faction_id = 0")
+            rebuild_totals()
+            # there can be a gap between the newest legacy attack and the
+            # oldest synced one, so backfill walks down again from the
+            # synced rows. rows it already has are skipped without a write
+            conn.execute(
+                "DELETE FROM faction_leaderboard_meta WHERE faction_id IN (0, ?) AND key IN "
+                "('backfill_state', 'leaderboard_backfill_done', 'leaderboard_backfill_to')",
+                (faction_id,),
+            )
+            state = {"floor": 0, "windows": [{"lo": 0, "hi": own_oldest, "to": own_oldest, "done": False}]}
+            set_meta(faction_id, "backfill_state", json.dumps(state, separators=(",", ":")))
+            set_meta(faction_id, "leaderboard_covered_since", str(own_oldest))
+            tracked = [
+                int(t)
+                for t in (get_meta(0, "leaderboard_tracked_since"), get_meta(faction_id, "leaderboard_tracked_since"))
+                if t
+            ]
+            if tracked:
+                set_meta(faction_id, "leaderboard_tracked_since", str(min(tracked)))
+            conn.execute(
+                "DELETE FROM faction_leaderboard_meta WHERE faction_id = 0 AND key = 'leaderboard_covered_since'"
+            )
+        # the faction's own meta, like a newer cursor, wins over legacy keys
+        conn.execute(
+            "UPDATE OR IGNORE faction_leaderboard_meta SET faction_id = ? WHERE faction_id = 0",
+            (faction_id,),
+        )
+        conn.execute("DELETE FROM faction_leaderboard_meta WHERE faction_id = 0")
+    LEADERBOARD_INDEX.invalidate(0)
+    LEADERBOARD_INDEX.invalidate(faction_id)
+    return moved
+
+
+def ingest_attack_page(faction_id: int, attacks: list[dict]) -> Dict[str, Any]:
+    """
+    applies one page of attacksfull in a single transaction. rows already
+    stored and unchanged are skipped, changed rows are updated in place and
+    new rows are inserted with their totals added per attacker
+
+    """
+    parsed: Dict[int, Dict[str, Any]] = {}
+    invalid = 0
+    for a in attacks:
+        row = _parse_attack(a)
+        if row is None:
+            invalid += 1
+            continue
+        row["faction_id"] = faction_id
+        parsed[row["attack_id"]] = row
+
+    stats: Dict[str, Any] = {
+        "added": 0,
+        "updated": 0,
+        "skipped": invalid,
+        "added_rows": [],
+    }
+    if not parsed:
+        return stats
+
+    with transaction() as conn:
+        ids = list(parsed)
+        existing: Dict[int, tuple] = {}
+        for chunk_start in range(0, len(ids), 500):
+            chunk = ids[chunk_start:chunk_start + 500]
+            marks = ",".join("?" * len(chunk))
+            cur = conn.execute(
+                f"SELECT {', '.join(_SEEN_COLUMNS)} FROM faction_attacks_seen "
+                f"WHERE faction_id = ? AND attack_id IN ({marks})",
+                (faction_id, *chunk),
+            )
+            for r in cur.fetchall():
+                existing[r[0]] = r
 
-    def extract_mugged(a: dict) -> float:
-        mugged = 0.0
-        for key in ("money_mugged", "mugged", "money", "cash"):
-            if key not in a:
+        inserts: list[tuple] = []
+        updates: list[tuple] = []
+        totals: Dict[int, list] = {}
+        hourly: Dict[tuple, list] = {}
+        daily: Dict[tuple, list] = {}
+        best_mug_dirty: set[int] = set()
+        seen_names: Dict[int, tuple[str, int]] = {}
+
+        def note_names(row: Dict[str, Any]) -> None:
+            for side in ("attacker", "defender"):
+                tid, name = row[f"{side}_id"], row[f"{side}_name"]
+                if tid and name and row["started"] >= seen_names.get(tid, ("", 0))[1]:
+                    seen_names[tid] = (name, row["started"])
+
+        for attack_id, row in parsed.items():
+            new_vals = tuple(row[c] for c in _SEEN_COLUMNS)
+            old = existing.get(attack_id)
+            if old is None:
+                note_names(row)
+                inserts.append((faction_id, *new_vals))
+                stats["added_rows"].append(row)
+                _add_to_totals(totals, row)
+                _add_to_rollups(hourly, daily, row)
                 continue
-            val = a.get(key)
-            if isinstance(val, dict):
-                for sub in ("amount", "value", "money"):
-                    if sub in val:
-                        mugged = to_float(val.get(sub, 0))
-                        break
-            else:
-                mugged = to_float(val)
-            if mugged:
-                break
-        return mugged
 
-    def apply_attack(a: dict) -> bool:
+            merged = tuple(n if n is not None else o for n, o in zip(new_vals, old))
+            if merged == tuple(old):
+                stats["skipped"] += 1
+                continue
+            updates.append(merged[1:] + (faction_id, attack_id))
+            stats["updated"] += 1
+            note_names(row)
+
+            # take the old row's share out and put the new one in
+            old_row = _stored_row(faction_id, old)
+            new_row = _stored_row(faction_id, merged)
+            _add_to_totals(totals, old_row, -1)
+            _add_to_totals(totals, new_row)
+            _add_to_rollups(hourly, daily, old_row, -1)
+            _add_to_rollups(hourly, daily, new_row)
+            if old_row["mugged"] or new_row["mugged"]:
+                best_mug_dirty.update((old_row["attacker_id"], new_row["attacker_id"]))
+
+        if inserts:
+            conn.executemany(
+                f"INSERT INTO faction_attacks_seen (faction_id, {', '.join(_SEEN_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' * len(_SEEN_COLUMNS))})",
+                inserts,
+            )
+        if updates:
+            conn.executemany(
+                f"UPDATE faction_attacks_seen SET {', '.join(c + ' = ?' for c in _SEEN_COLUMNS[1:])} "
+                "WHERE faction_id = ? AND attack_id = ?",
+                updates,
+            )
+        if totals:
+            conn.executemany(
+                """
+                INSERT INTO faction_leaderboard_totals
+                    (faction_id, attacker_id, attacks, mugs, hosp, respect_gain, respect_loss, mugged, best_mug)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(faction_id, attacker_id) DO UPDATE SET
+                    attacks = attacks + excluded.attacks,
+                    mugs = mugs + excluded.mugs,
+                    hosp = hosp + excluded.hosp,
+                    respect_gain = respect_gain + excluded.respect_gain,
+                    respect_loss = respect_loss + excluded.respect_loss,
+                    mugged = mugged + excluded.mugged,
+                    best_mug = CASE
+                        WHEN excluded.best_mug > best_mug THEN excluded.best_mug
+                        ELSE best_mug
+                    END
+                """,
+                [(faction_id, aid, *t) for aid, t in totals.items()],
+            )
+        if best_mug_dirty:
+            # a max can't be decremented, so recompute it for the few
+            # attackers whose mug amounts changed
+            conn.executemany(
+                """
+                UPDATE faction_leaderboard_totals SET best_mug = COALESCE((
+                    SELECT MAX(mugged) FROM faction_attacks_seen
+                    WHERE faction_id = ? AND attacker_id = ?
+                ), 0)
+                WHERE faction_id = ? AND attacker_id = ?
+                """,
+                [(faction_id, aid, faction_id, aid) for aid in best_mug_dirty],
+            )
+        _upsert_rollups(conn, hourly, daily)
+        if seen_names:
+            record_name_rows(conn, [(tid, name, ts) for tid, (name, ts) in seen_names.items()])
+    LEADERBOARD_INDEX.refresh(faction_id, totals.keys() | best_mug_dirty)
+
+    stats["added"] = len(inserts)
+    return stats
+
+
+def _page_cursor(attacks: list[dict]) -> tuple[int, int]:
+    best = (0, 0)
+    for a in attacks:
         try:
-            attack_id = int(a.get("id", 0) or 0)
-            started = int(a.get("started", 0) or 0)
-            ended = int(a.get("ended", 0) or 0)
-            attacker = a.get("attacker") or {}
-            defender = a.get("defender") or {}
-            attacker_id = int(attacker.get("id", 0) or 0)
-            defender_id = int(defender.get("id", 0) or 0)
+            key = (int(a.get("started", 0) or 0), int(a.get("id", 0) or 0))
         except Exception:
-            return False
-
-        if not attack_id or not attacker_id or not started:
-            return False
-
-        def clean_str(val) -> Optional[str]:
-            if val is None:
-                return None
-            if isinstance(val, str):
-                s = val.strip()
-                return s if s else None
-            return str(val)
-
-        res_l = str(a.get("result", "") or "").lower()
-        is_mug = 1 if "mug" in res_l else 0
-        is_hosp = 1 if "hospital" in res_l else 0
-        mugged = extract_mugged(a) if is_mug else 0.0
-
-        return _apply_attack(
-            attacker_id,
-            started,
-            attack_id,
-            ended=ended or None,
-            result=clean_str(a.get("result")),
-            is_mug=is_mug,
-            is_hosp=is_hosp,
-            respect_gain=to_float(a.get("respect_gain", 0)),
-            respect_loss=to_float(a.get("respect_loss", 0)),
-            mugged=mugged,
-            attacker_name=clean_str(attacker.get("name")),
-            defender_id=defender_id or None,
-            defender_name=clean_str(defender.get("name")),
-            raw_json=json.dumps(a, separators=(",", ":"), ensure_ascii=True),
+            continue
+        if key > best:
+            best = key
+    return best
+
+
+async def fetch_second(api_key: str, started: int, page: list[dict], sort: str, *, label: str = "") -> list[dict]:
+    """
+    the rest of one second after a full page of it came back in sort
+    order. the api pages by timestamp alone, so the second is read from
+    the other end, pages that overlap cover all of it, otherwise it's read
+    again until a page brings nothing new. beyond two pages a second
+    can't be reached with from and to, that gets logged
+
+    """
+    seen = {a.get("id") for a in page}
+    rest: list[dict] = []
+    for i in range(SECOND_PAGE_LIMIT):
+        sort = "ASC" if sort == "DESC" else "DESC"
+        data = await fetch_torn_v2(
+            "/faction/attacksfull",
+            api_key=api_key,
+            params={"limit": SYNC_PAGE_SIZE, "sort": sort, "from": started, "to": started},
         )
+        attacks = data.get("attacks") or []
+        new = [a for a in attacks if a.get("id") not in seen]
+        seen.update(a.get("id") for a in new)
+        rest.extend(new)
+        if i == 0 and (len(attacks) < SYNC_PAGE_SIZE or len(new) < len(attacks)):
+            # the two ends meet
+            return rest
+        if i and not new:
+            break
+    print(f"[{label}] second {started} fills a page from both ends, read {len(seen)}, any more can't be paged to")
+    return rest
+
+
+def _get_cursor(faction_id: int) -> Optional[tuple[int, int]]:
+    """
+    (started, attack_id) of the newest attack synced. stores from before the
+    cursor existed start from their newest stored row
+
+    """
+    raw = get_meta(faction_id, "leaderboard_cursor")
+    if raw:
+        ts, _, attack_id = raw.partition(":")
+        return int(ts), int(attack_id or 0)
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT started, attack_id FROM faction_attacks_seen WHERE faction_id = ? "
+            "ORDER BY started DESC, attack_id DESC LIMIT 1",
+            (faction_id,),
+        ).fetchone()
+    if not row:
+        return None
+    return int(row[0]), int(row[1])
+
+
+def note_tracked_since(faction_id: int, started: int) -> None:
+    with transaction():
+        existing = get_meta(faction_id, "leaderboard_tracked_since")
+        if not existing or started < int(existing):
+            set_meta(faction_id, "leaderboard_tracked_since", str(started))
+
+
+async def sync_faction_attacks(faction_id: int, api_key: str) -> Dict[str, Any]:
+    await run_db(ensure_store_ready)
+
+    cursor = await run_db(_get_cursor, faction_id)
+    added_samples: list[dict[str, Any]] = []
+    sample_limit = 5
+    pages: list[dict[str, int]] = []
 
     added = 0
+    updated = 0
+    skipped = 0
     max_started = 0
     min_started = 0
 
-    recent_attacks = await fetch_faction_attacks_since(
-        api_key,
-        since_utc=since_utc,
-        page_limit=RECENT_SYNC_PAGE_LIMIT,
-        per_page=100,
-    )
-
-    for a in recent_attacks:
-        if apply_attack(a):
-            added += 1
-            started = int(a.get("started", 0) or 0)
+    async def ingest(attacks: list[dict]) -> None:
+        nonlocal added, updated, skipped, max_started, min_started
+        page = await run_db(ingest_attack_page, faction_id, attacks)
+        pages.append({k: page[k] for k in ("added", "updated", "skipped")})
+        added += page["added"]
+        updated += page["updated"]
+        skipped += page["skipped"]
+        for row in page["added_rows"]:
+            started = row["started"]
             if started > max_started:
                 max_started = started
             if min_started == 0 or started < min_started:
                 min_started = started
             if len(added_samples) < sample_limit:
-                attacker = a.get("attacker") or {}
                 added_samples.append(
                     {
-                        "attack_id": int(a.get("id", 0) or 0),
-                        "attacker_id": int(attacker.get("id", 0) or 0),
-                        "attacker_name": attacker.get("name"),
+                        "attack_id": row["attack_id"],
+                        "attacker_id": row["attacker_id"],
+                        "attacker_name": row["attacker_name"],
                         "started": started,
                     }
                 )
 
-    backfill_done = _get_meta("leaderboard_backfill_done") == "1"
-    backfill_to = _get_meta("leaderboard_backfill_to")
-    to_param = int(backfill_to) if backfill_to else None
-
-    if not backfill_done:
-        for _ in range(BACKFILL_PAGE_LIMIT):
-            params = {"limit": 100, "sort": "DESC"}
-            if to_param is not None:
-                params["to"] = to_param
-            data = await fetch_torn_v2("/faction/attacksfull", api_key=api_key, params=params)
+    caught_up = False
+    if cursor is None:
+        # empty store, take the newest page and let backfill walk backwards
+        data = await fetch_torn_v2(
+            "/faction/attacksfull",
+            api_key=api_key,
+            params={"limit": SYNC_PAGE_SIZE, "sort": "DESC"},
+        )
+        attacks = data.get("attacks") or []
+        if attacks:
+            await ingest(attacks)
+            cursor = _page_cursor(attacks)
+        caught_up = True
+    else:
+        from_param = max(0, cursor[0] - SYNC_CURSOR_OVERLAP_SECONDS)
+        for _ in range(SYNC_PAGE_LIMIT):
+            data = await fetch_torn_v2(
+                "/faction/attacksfull",
+                api_key=api_key,
+                params={"limit": SYNC_PAGE_SIZE, "sort": "ASC", "from": from_param},
+            )
             attacks = data.get("attacks") or []
-            if not attacks:
-                backfill_done = True
+            if attacks:
+                await ingest(attacks)
+                cursor = max(cursor, _page_cursor(attacks))
+            if len(attacks) < SYNC_PAGE_SIZE:
+                caught_up = True
                 break
+            next_from = _page_cursor(attacks)[0]
+            if next_from > from_param:
+                # the next page starts over on the last second, so a
+                # second split across pages is still read whole
+                from_param = next_from
+                continue
+            # a full page inside one second, from can't get past it
+            rest = await fetch_second(api_key, from_param, attacks, "ASC", label=f"sync {faction_id}")
+            if rest:
+                await ingest(rest)
+                cursor = max(cursor, _page_cursor(rest))
+            from_param += 1
 
-            for a in attacks:
-                if apply_attack(a):
-                    added += 1
-                    started = int(a.get("started", 0) or 0)
-                    if started > max_started:
-                        max_started = started
-                    if min_started == 0 or started < min_started:
-                        min_started = started
-                    if len(added_samples) < sample_limit:
-                        attacker = a.get("attacker") or {}
-                        added_samples.append(
-                            {
-                                "attack_id": int(a.get("id", 0) or 0),
-                                "attacker_id": int(attacker.get("id", 0) or 0),
-                                "attacker_name": attacker.get("name"),
-                                "started": started,
-                            }
-                        )
-
-            to_param = int(attacks[-1].get("ended", 0) or 0)
-            if not to_param:
-                backfill_done = True
-                break
+    if cursor is not None:
+        await run_db(set_meta, faction_id, "leaderboard_cursor", f"{cursor[0]}:{cursor[1]}")
 
-    if max_started:
-        _set_meta("leaderboard_last_sync_started", str(max_started))
     if min_started:
-        existing = _get_meta("leaderboard_tracked_since")
-        if not existing or min_started < int(existing):
-            _set_meta("leaderboard_tracked_since", str(min_started))
+        await run_db(note_tracked_since, faction_id, min_started)
 
-    if backfill_done:
-        _set_meta("leaderboard_backfill_done", "1")
-    if to_param:
-        _set_meta("leaderboard_backfill_to", str(to_param))
+    if caught_up:
+        await run_db(set_meta, faction_id, "leaderboard_last_sync_at", str(int(time.time())))
 
     return {
+        "faction_id": faction_id,
         "added": added,
-        "backfill_done": backfill_done,
+        "updated": updated,
+        "skipped": skipped,
+        "pages": pages,
+        "caught_up": caught_up,
+        "cursor": cursor,
         "max_started": max_started or None,
         "min_started": min_started or None,
-        "backfill_to": to_param,
-        "tracked_since": _get_meta("leaderboard_tracked_since"),
+        "tracked_since": await run_db(get_meta, faction_id, "leaderboard_tracked_since"),
         "added_samples": added_samples,
     }
 
 
-def get_overall_leaderboard() -> Dict[str, Any]:
-    conn = get_conn()
+def get_store_coverage(faction_id: int) -> Dict[str, Any]:
+    """
+    the stored attacks are contiguous from covered_since up to the last
+    sync, covered_since is 0 once backfill has reached the oldest attack.
+    parallel backfill windows leave holes, so the worker records how far
+    the unbroken run reaches
+
+    """
+    with transaction() as conn:
+        oldest, newest = conn.execute(
+            "SELECT MIN(started), MAX(started) FROM faction_attacks_seen WHERE faction_id = ?",
+            (faction_id,),
+        ).fetchone()
+        backfill_done = get_meta(faction_id, "leaderboard_backfill_done") == "1"
+        covered_since = get_meta(faction_id, "leaderboard_covered_since")
+        synced_at = get_meta(faction_id, "leaderboard_last_sync_at")
+    if backfill_done:
+        covered_since = 0
+    elif covered_since is not None:
+        covered_since = int(covered_since)
+    else:
+        covered_since = oldest
+    return {
+        "covered_since": covered_since,
+        "newest": newest,
+        "synced_at": int(synced_at) if synced_at else None,
+    }
+
+
+def covers(coverage: Dict[str, Any], since_utc: int) -> bool:
+    covered_since = coverage.get("covered_since")
+    return covered_since is not None and coverage.get("synced_at") is not None and covered_since <= since_utc
+
+
+def get_stored_names(ids: Iterable[int]) -> Dict[int, str]:
+    """
+    latest name seen for each id, from attacks on either side, member
+    lists and profile lookups
+
+    """
+    return lookup_names(ids)
+
+
+LEADERBOARD_CATEGORIES = ("attacks", "mugs", "hosp", "respect_gain", "mugged")
+OVERALL_CATEGORIES = LEADERBOARD_CATEGORIES + ("best_mug",)
 
-    def top_row(col: str):
-        cur = conn.execute(
-            f"SELECT attacker_id, {col} FROM faction_leaderboard_totals ORDER BY {col} DESC LIMIT 1"
-        )
-        return cur.fetchone()
 
-    most_attacks = top_row("attacks")
-    most_mugs = top_row("mugs")
-    most_hosp = top_row("hosp")
-    most_rg = top_row("respect_gain")
-    best_mug = top_row("best_mug")
+def get_range_leaderboard(faction_id: int, since_utc: int, until_utc: int, *, top_n: int = 5) -> Dict[str, Any]:
+    """
+    top_n attackers per category for attacks started in [since_utc, until_utc)
+    plus faction wide sums for the same window
 
-    cur = conn.execute("SELECT SUM(mugged) FROM faction_leaderboard_totals")
-    total_mugged = cur.fetchone()[0] or 0
+    """
+    totals = get_window_totals(faction_id, since_utc, until_utc)
+    rankings = {
+        cat: [
+            (aid, t[cat])
+            for aid, t in heapq.nlargest(top_n, totals.items(), key=lambda kv: kv[1][cat])
+            if t[cat]
+        ]
+        for cat in LEADERBOARD_CATEGORIES
+    }
+    summary = dict.fromkeys(_ROLLUP_FIELDS, 0)
+    for t in totals.values():
+        for c in _ROLLUP_FIELDS:
+            summary[c] += t[c]
+    return {
+        "rankings": rankings,
+        "summary": summary,
+        "attackers": len(totals),
+    }
 
-    tracked_since = _get_meta("leaderboard_tracked_since")
-    backfill_done = _get_meta("leaderboard_backfill_done") == "1"
-    conn.close()
+
+def get_overall_leaderboard(faction_id: int, *, top_n: int = 3) -> Dict[str, Any]:
+    """
+    all time top_n per category, answered from the in memory index rather
+    than sorting the totals table on every call
+
+    """
+    board = LEADERBOARD_INDEX.board(faction_id)
+    rankings = {cat: board.top(cat, top_n) for cat in OVERALL_CATEGORIES}
+    with transaction():
+        tracked_since = get_meta(faction_id, "leaderboard_tracked_since")
+        backfill_done = get_meta(faction_id, "leaderboard_backfill_done") == "1"
 
     return {
-        "most_attacks": most_attacks,
-        "most_mugs": most_mugs,
-        "most_hosp": most_hosp,
-        "most_rg": most_rg,
-        "best_mug": best_mug,
-        "total_mugged": float(total_mugged or 0),
+        "rankings": rankings,
+        "total_mugged": board.sums["mugged"],
+        "attackers": len(board.values),
         "tracked_since": tracked_since,
         "backfill_done": backfill_done,
     }
+
+
+def get_overall_rank(faction_id: int, attacker_id: int) -> Dict[str, tuple[int, float]]:
+    """
+    (rank, value) per category for one attacker, empty if they have no
+    stored attacks
+
+    """
+    board = LEADERBOARD_INDEX.board(faction_id)
+    values = board.values.get(attacker_id)
+    if values is None:
+        return {}
+    return {cat: (board.rank(cat, attacker_id), values[i]) for i, cat in enumerate(INDEX_METRICS)}
+
+
+def get_window_totals(faction_id: int, since_utc: int, until_utc: int) -> Dict[int, Dict[str, float]]:
+    """
+    per attacker totals for attacks started in [since_utc, until_utc). whole
+    london days come from the daily rollup, whole hours from the hourly one
+    and only the ragged edges are read from faction_attacks_seen
+
+    """
+    totals: Dict[int, Dict[str, float]] = {}
+    if until_utc <= since_utc:
+        return totals
+
+    def add(rows) -> None:
+        for r in rows:
+            t = totals.setdefault(r[0], dict.fromkeys(_ROLLUP_FIELDS, 0))
+            for i, c in enumerate(_ROLLUP_FIELDS, start=1):
+                t[c] += r[i] or 0
+
+    sums = ", ".join(f"SUM({c})" for c in _ROLLUP_FIELDS)
+    raw_sums = (
+        "COUNT(*), "
+        "SUM(CASE WHEN LOWER(COALESCE(result, '')) LIKE '%mug%' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN LOWER(COALESCE(result, '')) LIKE '%hospital%' THEN 1 ELSE 0 END), "
+        "SUM(respect_gain), SUM(respect_loss), SUM(COALESCE(mugged, 0))"
+    )
+
+    hour_lo = since_utc + (-since_utc % 3600)
+    hour_hi = until_utc - until_utc % 3600
+
+    with transaction() as conn:
+        if hour_lo >= hour_hi:
+            add(conn.execute(
+                f"SELECT attacker_id, {raw_sums} FROM faction_attacks_seen "
+                "WHERE faction_id = ? AND started >= ? AND started < ? GROUP BY attacker_id",
+                (faction_id, since_utc, until_utc),
+            ))
+            return totals
+
+        for lo, hi in ((since_utc, hour_lo), (hour_hi, until_utc)):
+            if lo < hi:
+                add(conn.execute(
+                    f"SELECT attacker_id, {raw_sums} FROM faction_attacks_seen "
+                    "WHERE faction_id = ? AND started >= ? AND started < ? GROUP BY attacker_id",
+                    (faction_id, lo, hi),
+                ))
+
+        # first and last london midnights inside the hour aligned span
+        day_lo = london_day_start_for(hour_lo)
+        if day_lo < hour_lo:
+            day_lo = london_day_start_for(day_lo + 26 * 3600)
+        day_hi = london_day_start_for(hour_hi)
+
+        if day_lo >= day_hi:
+            add(conn.execute(
+                f"SELECT attacker_id, {sums} FROM faction_rollup_hourly "
+                "WHERE faction_id = ? AND bucket_start >= ? AND bucket_start < ? GROUP BY attacker_id",
+                (faction_id, hour_lo, hour_hi),
+            ))
+            return totals
+
+        for lo, hi in ((hour_lo, day_lo), (day_hi, hour_hi)):
+            if lo < hi:
+                add(conn.execute(
+                    f"SELECT attacker_id, {sums} FROM faction_rollup_hourly "
+                    "WHERE faction_id = ? AND bucket_start >= ? AND bucket_start < ? GROUP BY attacker_id",
+                    (faction_id, lo, hi),
+                ))
+        add(conn.execute(
+            f"SELECT attacker_id, {sums} FROM faction_rollup_daily "
+            "WHERE faction_id = ? AND day_start >= ? AND day_start < ? GROUP BY attacker_id",
+            (faction_id, day_lo, day_hi),
+        ))
+
+    return totals
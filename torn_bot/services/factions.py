@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from torn_bot.api.errors import TornAPIError
+from torn_bot.api.torn_v2 import fetch_torn_v2
+from torn_bot.config import FACTION_SYNC_CONCURRENCY
+from torn_bot.db import run_db
+from torn_bot.services.faction_leaderboard_store import claim_legacy_rows, sync_faction_attacks
+
+
+# the primary faction keeps the original "faction" global key, allied
+# factions are stored as "faction:<id>"
+PRIMARY_KEY_NAME = "faction"
+ALLIED_KEY_PREFIX = "faction:"
+
+_FACTION_IDS: Dict[str, int] = {}
+_CLAIMED = False
+
+
+async def faction_id_for_key(api_key: str) -> int:
+    """
+    the faction a key belongs to, looked up once per key via v2 /faction/basic
+
+    """
+    faction_id = _FACTION_IDS.get(api_key)
+    if faction_id is not None:
+        return faction_id
+    data = await fetch_torn_v2("/faction/basic", api_key=api_key)
+    basic = data.get("basic") or data
+    try:
+        faction_id = int(basic.get("id", 0) or 0)
+    except Exception:
+        faction_id = 0
+    if not faction_id:
+        raise TornAPIError(0, "key owner is not in a faction")
+    _FACTION_IDS[api_key] = faction_id
+    return faction_id
+
+
+async def _claim_legacy_once(faction_id: int) -> None:
+    global _CLAIMED
+    if not _CLAIMED:
+        await run_db(claim_legacy_rows, faction_id)
+        _CLAIMED = True
+
+
+async def faction_keys(storage) -> List[Tuple[int, str]]:
+    """
+    (faction_id, api_key) for every faction the bot tracks, primary first.
+    the first time the primary faction is seen it claims legacy rows
+
+    """
+    keys: List[Tuple[int, str]] = []
+    primary = await storage.get_global_key(PRIMARY_KEY_NAME)
+    if primary:
+        try:
+            faction_id = await faction_id_for_key(primary)
+        except TornAPIError:
+            faction_id = 0
+        if faction_id:
+            await _claim_legacy_once(faction_id)
+            keys.append((faction_id, primary))
+
+    for name, api_key in await storage.list_global_keys(ALLIED_KEY_PREFIX):
+        try:
+            faction_id = int(name[len(ALLIED_KEY_PREFIX):])
+        except ValueError:
+            continue
+        if faction_id and all(faction_id != fid for fid, _ in keys):
+            _FACTION_IDS.setdefault(api_key, faction_id)
+            keys.append((faction_id, api_key))
+    return keys
+
+
+async def faction_key_for(
+    storage,
+    *,
+    faction_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> Optional[Tuple[int, str]]:
+    """
+    key used by a command: the requested faction's key, else the primary
+    key, else the caller's own key
+
+    """
+    if faction_id:
+        for fid, api_key in await faction_keys(storage):
+            if fid == faction_id:
+                return fid, api_key
+        return None
+    api_key = await storage.get_global_key(PRIMARY_KEY_NAME)
+    if api_key:
+        faction_id = await faction_id_for_key(api_key)
+        # a command can run before the sync loop has claimed legacy rows,
+        # its sync must not write under the real id ahead of them
+        await _claim_legacy_once(faction_id)
+        return faction_id, api_key
+    if user_id is not None:
+        api_key = await storage.get_key(user_id)
+    if not api_key:
+        return None
+    return await faction_id_for_key(api_key), api_key
+
+
+async def sync_all_factions(storage) -> List[Dict[str, Any]]:
+    """
+    syncs every tracked faction concurrently, each on its own key and so
+    its own rate bucket. a failing faction doesn't hold up the others
+
+    """
+    keys = await faction_keys(storage)
+    sem = asyncio.Semaphore(FACTION_SYNC_CONCURRENCY)
+
+    async def sync_one(faction_id: int, api_key: str) -> Dict[str, Any]:
+        async with sem:
+            try:
+                return await sync_faction_attacks(faction_id, api_key)
+            except Exception as e:
+                return {"faction_id": faction_id, "error": str(e)}
+
+    return list(await asyncio.gather(*(sync_one(fid, key) for fid, key in keys)))
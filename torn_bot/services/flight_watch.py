@@ -5,22 +5,68 @@ from datetime import datetime
 import discord
 
 from torn_bot.api.torn_v2 import fetch_torn_v2, TornAPIError
+from torn_bot.api.rate_limit import request_priority, PRIORITY_FLIGHT
 from torn_bot.config import (
     FLIGHT_ALERT_CHANNEL_ID,
     FLIGHT_CHECK_INTERVAL_S,
+    FLIGHT_IDLE_INTERVAL_S,
     FLIGHT_API_KEY,
     FLIGHT_IDS_FILE,
     FLIGHT_MENTION_USER_ID,
 )
-from torn_bot.storage import KeyStorage
+from torn_bot.storage import AsyncKeyStorage
+from torn_bot.db import run_db
+from torn_bot.services.player_names import record_names
+
+
+FLIGHT_FETCH_CONCURRENCY = 8
+
+# standard one way flight time from torn, in minutes
+FLIGHT_MINUTES = {
+    "Mexico": 26,
+    "Cayman Islands": 35,
+    "Canada": 41,
+    "Hawaii": 134,
+    "United Kingdom": 159,
+    "Argentina": 167,
+    "Switzerland": 175,
+    "Japan": 225,
+    "China": 242,
+    "UAE": 271,
+    "South Africa": 297,
+}
+# status plane_image_type -> share of the standard time. airliner is a
+# normal ticket, light_aircraft the private airstrip, private_jet a WLT
+# benefit and airliner_business a business class ticket
+PLANE_MULTIPLIERS = {
+    "airliner": 1.0,
+    "light_aircraft": 0.7,
+    "private_jet": 0.5,
+    "airliner_business": 0.3,
+}
+
+LANDING_POLL_S = 15
+# a player abroad can leave at any moment, how often they're checked sets
+# how precisely the departure and so the landing is known
+ABROAD_POLL_S = 120
+# dense polling starts this long before the earliest possible landing and
+# carries on this long after the latest
+LANDING_LEAD_S = 60
+LANDING_GRACE_S = 120
+MAX_INFLIGHT_SLEEP_S = 30 * 60
 
 
 def _log(msg: str) -> None:
     ts = datetime.now().strftime("%H:%M:%S")
     print(f"[flight {ts}] {msg}")
 
-_LAST_STATE: dict[int, tuple[str | None, str | None]] = {}
+_LAST_STATE: dict[int, tuple[str | None, str | None, str]] = {}
 _LAST_IDS_ERROR: str | None = None
+_LAST_SUMMARY: str | None = None
+# per id: when it was last fetched, when it's next due and the flight it's on
+_LAST_POLL: dict[int, float] = {}
+_NEXT_POLL: dict[int, float] = {}
+_FLIGHTS: dict[int, dict] = {}
 
 
 async def _get_channel(client: discord.Client) -> discord.abc.Messageable | None:
@@ -48,6 +94,78 @@ def _returning_to_torn(desc: str | None) -> bool:
     return "torn" in d and ("return" in d or "to torn" in d)
 
 
+def _destination(desc: str) -> str | None:
+    d = desc.lower()
+    for name in FLIGHT_MINUTES:
+        if name.lower() in d:
+            return name
+    return None
+
+
+def predict_landing(status: dict, departed_lo: float | None, departed_hi: float) -> tuple[float, float, bool] | None:
+    """
+    (earliest, latest, precise) landing time for a flight that left between
+    departed_lo and departed_hi. precise is False when the plane type is
+    unknown and the window spans every plane. None when it can't be told
+
+    """
+    until = int(status.get("until") or 0)
+    if until > 0:
+        return float(until), float(until), True
+    dest = _destination(status.get("description") or "")
+    if dest is None or departed_lo is None:
+        return None
+    flight_s = FLIGHT_MINUTES[dest] * 60
+    mult = PLANE_MULTIPLIERS.get(status.get("plane_image_type") or "")
+    if mult is None:
+        return departed_lo + flight_s * min(PLANE_MULTIPLIERS.values()), departed_hi + flight_s, False
+    return departed_lo + flight_s * mult, departed_hi + flight_s * mult, True
+
+
+def _schedule(torn_id: int, now: float, status: dict) -> float:
+    """
+    when to look at this id again. players at home are checked rarely,
+    abroad ones often enough to pin down a departure, and those flying
+    home sleep until just before they can land and are then polled densely
+
+    """
+    state = status.get("state") or ""
+    description = status.get("description") or status.get("details") or ""
+    if state != "Traveling":
+        _FLIGHTS.pop(torn_id, None)
+        return now + (ABROAD_POLL_S if state == "Abroad" else FLIGHT_IDLE_INTERVAL_S)
+
+    flight = _FLIGHTS.get(torn_id)
+    if flight is None or flight["description"] != description:
+        # it left after the previous fetch, unknown on the first one
+        flight = {"description": description, "departed_lo": _LAST_POLL.get(torn_id), "departed_hi": now}
+        _FLIGHTS[torn_id] = flight
+    window = predict_landing(status, flight["departed_lo"], flight["departed_hi"])
+
+    if not _returning_to_torn(description):
+        # only landings in torn alert, an outbound flight is left alone
+        # until it could have landed and then watched like anyone abroad
+        if window is not None and now < window[0]:
+            return min(window[0], now + MAX_INFLIGHT_SLEEP_S)
+        return now + ABROAD_POLL_S
+    if window is None:
+        return now + FLIGHT_CHECK_INTERVAL_S
+    earliest, latest, precise = window
+    if now < earliest - LANDING_LEAD_S:
+        return min(earliest - LANDING_LEAD_S, now + MAX_INFLIGHT_SLEEP_S)
+    if now <= latest + LANDING_GRACE_S:
+        return now + (LANDING_POLL_S if precise else FLIGHT_CHECK_INTERVAL_S)
+    return now + FLIGHT_CHECK_INTERVAL_S
+
+
+def seconds_until_next_poll(now: float | None = None) -> float:
+    now = time.time() if now is None else now
+    if not _NEXT_POLL:
+        return float(max(10, FLIGHT_CHECK_INTERVAL_S))
+    # capped so ids added to the file are picked up within one interval
+    return min(max(1.0, min(_NEXT_POLL.values()) - now), float(max(10, FLIGHT_CHECK_INTERVAL_S)))
+
+
 def _log_ids_error(msg: str) -> None:
     global _LAST_IDS_ERROR
     if msg != _LAST_IDS_ERROR:
@@ -104,49 +222,75 @@ def _load_flight_ids() -> list[int]:
     return ids
 
 
-async def flight_watch_once(client: discord.Client, storage: KeyStorage) -> None:
-    api_key = FLIGHT_API_KEY or storage.get_global_key("flight")
+async def flight_watch_once(client: discord.Client, storage: AsyncKeyStorage) -> bool:
+    """
+    fetches the ids that are due. False when the watch is skipped
+    altogether, so the loop backs off to the normal interval
+
+    """
+    global _LAST_SUMMARY
+    api_key = FLIGHT_API_KEY or await storage.get_global_key("flight")
     if not api_key:
         _log("flight watch skipped: no FLIGHT_API_KEY set")
-        return
+        return False
 
     ids = _load_flight_ids()
     if not ids:
-        return
+        return False
 
     channel = await _get_channel(client)
     if channel is None:
         _log(f"flight watch skipped: channel {FLIGHT_ALERT_CHANNEL_ID} not accessible")
-        return
+        return False
 
     current_ids = set(ids)
-    for tid in list(_LAST_STATE.keys()):
-        if tid not in current_ids:
-            _LAST_STATE.pop(tid, None)
+    for cache in (_LAST_STATE, _LAST_POLL, _NEXT_POLL, _FLIGHTS):
+        for tid in list(cache.keys()):
+            if tid not in current_ids:
+                cache.pop(tid, None)
+
+    now = time.time()
+    due = [tid for tid in ids if _NEXT_POLL.get(tid, 0.0) <= now]
+    if not due:
+        return True
+
+    seen_names: dict[int, str] = {}
+    sem = asyncio.Semaphore(FLIGHT_FETCH_CONCURRENCY)
+
+    async def fetch_one(torn_id: int) -> dict | None:
+        # each request still waits on its key's rate bucket, the semaphore
+        # only caps how many are queued at once
+        async with sem:
+            try:
+                return await fetch_torn_v2(
+                    f"/user/{torn_id}/basic",
+                    api_key=api_key,
+                    pooled=True,
+                )
+            except TornAPIError as e:
+                _log(f"flight watch error {torn_id}: {e.message}")
+            except Exception as e:
+                _log(f"flight watch error {torn_id}: {e}")
+            return None
 
-    traveling_lines: list[str] = []
+    results = await asyncio.gather(*(fetch_one(tid) for tid in due))
 
-    for torn_id in ids:
-        last_state, last_description = _LAST_STATE.get(torn_id, (None, None))
-        try:
-            data = await fetch_torn_v2(f"/user/{torn_id}/basic", api_key=api_key)
-        except TornAPIError as e:
-            _log(f"flight watch error {torn_id}: {e.message}")
+    # alerts go out in watchlist order whatever order the fetches finished in
+    for torn_id, data in zip(due, results):
+        polled_at = time.time()
+        if data is None:
+            _NEXT_POLL[torn_id] = polled_at + FLIGHT_CHECK_INTERVAL_S
             continue
-        except Exception as e:
-            _log(f"flight watch error {torn_id}: {e}")
-            continue
-
+        last_state, last_description, _ = _LAST_STATE.get(torn_id, (None, None, ""))
         profile = _extract_profile(data)
         name = profile.get("name") or str(torn_id)
+        if profile.get("name"):
+            seen_names[torn_id] = profile["name"]
         status = profile.get("status") or {}
         state = status.get("state") or ""
         description = status.get("description") or status.get("details") or ""
 
         is_traveling = state == "Traveling"
-        if is_traveling:
-            desc = description or "Traveling"
-            traveling_lines.append(f"{name}[{torn_id}] - {desc}")
         msg = None
 
         profile_url = f"https://www.torn.com/profiles.php?XID={torn_id}"
@@ -164,23 +308,33 @@ async def flight_watch_once(client: discord.Client, storage: KeyStorage) -> None
             except Exception as e:
                 _log(f"flight watch notify failed {torn_id}: {e}")
 
-        _LAST_STATE[torn_id] = (state or None, description or None)
+        _LAST_STATE[torn_id] = (state or None, description or None, name)
+        _NEXT_POLL[torn_id] = _schedule(torn_id, polled_at, status)
+        _LAST_POLL[torn_id] = now
+
+    if seen_names:
+        await run_db(record_names, seen_names)
 
-    if traveling_lines:
-        _log(f"{', '.join(traveling_lines)} is flying")
-    else:
-        _log("no one flying")
+    # ticks are irregular now, so only log when who's flying changes
+    traveling_lines = [
+        f"{name}[{tid}] - {desc or 'Traveling'}"
+        for tid, (state, desc, name) in _LAST_STATE.items()
+        if state == "Traveling"
+    ]
+    summary = f"{', '.join(traveling_lines)} is flying" if traveling_lines else "no one flying"
+    if summary != _LAST_SUMMARY:
+        _log(summary)
+        _LAST_SUMMARY = summary
+    return True
 
 
-async def run_flight_watch_loop(client: discord.Client, storage: KeyStorage) -> None:
+async def run_flight_watch_loop(client: discord.Client, storage: AsyncKeyStorage) -> None:
     await client.wait_until_ready()
-    interval = max(10, FLIGHT_CHECK_INTERVAL_S)
     while not client.is_closed():
-        start = time.monotonic()
         try:
-            await flight_watch_once(client, storage)
+            with request_priority(PRIORITY_FLIGHT):
+                ran = await flight_watch_once(client, storage)
         except Exception as e:
             _log(f"flight watch loop error: {e}")
-        elapsed = time.monotonic() - start
-        sleep_s = max(1.0, interval - elapsed)
-        await asyncio.sleep(sleep_s)
+            ran = False
+        await asyncio.sleep(seconds_until_next_poll() if ran else max(10, FLIGHT_CHECK_INTERVAL_S))
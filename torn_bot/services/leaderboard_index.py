@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from torn_bot.db import transaction
+
+
+METRICS = ("attacks", "mugs", "hosp", "respect_gain", "mugged", "best_mug")
+
+
+class FactionBoard:
+    """
+    one faction's totals with a sorted list per metric. entries are
+    (-value, attacker_id) so the list head is first place and ties go to
+    the lower id
+
+    """
+
+    def __init__(self):
+        self.values: Dict[int, Tuple[float, ...]] = {}
+        self.ranked: Dict[str, List[Tuple[float, int]]] = {m: [] for m in METRICS}
+        self.sums: Dict[str, float] = dict.fromkeys(METRICS, 0.0)
+
+    def set(self, attacker_id: int, values: Optional[Tuple[float, ...]]) -> None:
+        old = self.values.pop(attacker_id, None)
+        if old is not None:
+            for i, m in enumerate(METRICS):
+                ranked = self.ranked[m]
+                pos = bisect_left(ranked, (-old[i], attacker_id))
+                if pos < len(ranked) and ranked[pos] == (-old[i], attacker_id):
+                    del ranked[pos]
+                self.sums[m] -= old[i]
+        if values is None:
+            return
+        self.values[attacker_id] = values
+        for i, m in enumerate(METRICS):
+            insort(self.ranked[m], (-values[i], attacker_id))
+            self.sums[m] += values[i]
+
+    def top(self, metric: str, n: int) -> List[Tuple[int, float]]:
+        return [(aid, -neg) for neg, aid in self.ranked[metric][:n] if neg]
+
+    def rank(self, metric: str, attacker_id: int) -> Optional[int]:
+        values = self.values.get(attacker_id)
+        if values is None:
+            return None
+        return bisect_left(self.ranked[metric], (-values[METRICS.index(metric)], attacker_id)) + 1
+
+
+_SELECT = f"SELECT attacker_id, {', '.join(METRICS)} FROM faction_leaderboard_totals WHERE faction_id = ?"
+
+
+class LeaderboardIndex:
+    """
+    in memory rankings over faction_leaderboard_totals. only touched from
+    the db thread (through run_db), so it needs no lock of its own
+
+    """
+
+    def __init__(self):
+        self.boards: Dict[int, FactionBoard] = {}
+
+    def load(self, faction_id: int) -> FactionBoard:
+        board = FactionBoard()
+        with transaction() as conn:
+            rows = conn.execute(_SELECT, (faction_id,)).fetchall()
+        for r in rows:
+            board.set(int(r[0]), tuple(float(v or 0) for v in r[1:]))
+        self.boards[faction_id] = board
+        return board
+
+    def board(self, faction_id: int) -> FactionBoard:
+        board = self.boards.get(faction_id)
+        if board is None:
+            board = self.load(faction_id)
+        return board
+
+    def refresh(self, faction_id: int, attacker_ids: Iterable[int]) -> None:
+        """
+        re-reads the given attackers' totals after an ingest. factions not
+        loaded yet are skipped, they'll be read whole on first use
+
+        """
+        board = self.boards.get(faction_id)
+        ids = list(set(attacker_ids))
+        if board is None or not ids:
+            return
+        found: Dict[int, Tuple[float, ...]] = {}
+        with transaction() as conn:
+            for chunk_start in range(0, len(ids), 500):
+                chunk = ids[chunk_start:chunk_start + 500]
+                marks = ",".join("?" * len(chunk))
+                for r in conn.execute(f"{_SELECT} AND attacker_id IN ({marks})", (faction_id, *chunk)):
+                    found[int(r[0])] = tuple(float(v or 0) for v in r[1:])
+        for aid in ids:
+            board.set(aid, found.get(aid))
+
+    def invalidate(self, faction_id: Optional[int] = None) -> None:
+        if faction_id is None:
+            self.boards.clear()
+        else:
+            self.boards.pop(faction_id, None)
+
+
+LEADERBOARD_INDEX = LeaderboardIndex()
@@ -2,116 +2,170 @@ from __future__ import annotations
 
 import asyncio
 import time
-from typing import Dict, Set, Optional
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Optional
 
-from torn_bot.api.torn_v2 import get_session
+from torn_bot.api.torn import fetch_torn_api, TornAPIError
+from torn_bot.api.torn_v2 import fetch_torn_v2
+from torn_bot.config import NAME_CACHE_MAX_ENTRIES
+from torn_bot.db import run_db
+from torn_bot.services.factions import faction_id_for_key
+from torn_bot.services.player_names import lookup_names, record_names
+from torn_bot.utils.lru import LRUCache
 
-TORN_V1_BASE = "https://api.torn.com"
-
-_USER_NAME_CACHE: Dict[int, tuple[str, float]] = {}
+_USER_NAME_CACHE = LRUCache(NAME_CACHE_MAX_ENTRIES)
 _USER_TTL_SECONDS = 6 * 60 * 60
-_FACTION_MEMBER_CACHE: Dict[int, str] = {}
-_FACTION_MEMBER_EXPIRES_AT: float = 0.0
+# member maps per faction id, every key in a faction reads the same one
+_FACTION_MEMBER_CACHE = LRUCache(64)
 _FACTION_MEMBER_TTL_SECONDS = 10 * 60
+# past its ttl an entry is still served for this long while a background
+# refresh replaces it, only older entries make the caller wait
+_STALE_GRACE_SECONDS = 60 * 60
 
+# one refresh per user id or faction key at a time, later callers join it
+_INFLIGHT: Dict[Hashable, asyncio.Future] = {}
 
-def _user_cache_get(torn_id: int) -> Optional[str]:
-    item = _USER_NAME_CACHE.get(torn_id)
-    if not item:
-        return None
-    name, expires_at = item
-    if time.time() >= expires_at:
-        _USER_NAME_CACHE.pop(torn_id, None)
-        return None
-    return name
 
+def _forget(key: Hashable, fut: asyncio.Future) -> None:
+    if _INFLIGHT.get(key) is fut:
+        _INFLIGHT.pop(key, None)
+    if not fut.cancelled():
+        fut.exception()
 
-def _user_cache_set(torn_id: int, name: str) -> None:
-    _USER_NAME_CACHE[torn_id] = (name, time.time() + _USER_TTL_SECONDS)
 
+def _shared(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+    fut = _INFLIGHT.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(factory())
+        _INFLIGHT[key] = fut
+        fut.add_done_callback(lambda f: _forget(key, f))
+    return fut
 
-async def _fetch_user_basic_name_v1(api_key: str, torn_id: int) -> Optional[str]:
+
+def _cached(cache: LRUCache, key: Hashable, refresh_key: Hashable, refresh: Callable[[], Awaitable[Any]]) -> Any:
     """
-    v1: /user/{id}?selections=basic
+    fresh value, or a stale one with a refresh started behind it. None
+    once the entry is missing or past the grace period
 
     """
-    session = await get_session()
-    url = f"{TORN_V1_BASE}/user/{torn_id}"
-    params = {"selections": "basic", "key": api_key}
+    item = cache.get_entry(key)
+    if item is None:
+        return None
+    value, expires_at = item
+    now = time.time()
+    if now < expires_at:
+        return value
+    if now < expires_at + _STALE_GRACE_SECONDS:
+        _shared(refresh_key, refresh)
+        return value
+    cache.pop(key)
+    return None
+
 
-    async with session.get(url, params=params) as resp:
-        data = await resp.json()
+async def _fetch_user_basic_name_v1(api_key: str, torn_id: int) -> Optional[str]:
+    """
+    v1: /user/{id}?selections=basic
 
-    if isinstance(data, dict) and "error" in data:
+    """
+    try:
+        data = await fetch_torn_api("user", "basic", api_key, torn_id, pooled=True)
+    except TornAPIError:
         return None
 
     name = (data.get("name") or "").strip()
     return name if name else None
 
 
-async def _refresh_faction_members(api_key: str) -> None:
-    """
-    v1: /faction/?selections=basic,members a map of member_id -> member_name
-
-    """
-    global _FACTION_MEMBER_CACHE, _FACTION_MEMBER_EXPIRES_AT
+async def _load_user_name(api_key: str, torn_id: int) -> Optional[str]:
+    name = await _fetch_user_basic_name_v1(api_key, torn_id)
+    if name:
+        _USER_NAME_CACHE.set(torn_id, name, _USER_TTL_SECONDS)
+        await run_db(record_names, {torn_id: name})
+    return name
 
-    session = await get_session()
-    url = f"{TORN_V1_BASE}/faction/"
-    params = {"selections": "basic,members", "key": api_key}
 
-    async with session.get(url, params=params) as resp:
-        data = await resp.json()
+async def _refresh_faction_members(api_key: str, faction_id: int) -> None:
+    """
+    v2: /faction/members a map of member_id -> member_name, same request as
+    /faction_inactive so concurrent callers share one response
 
-    if isinstance(data, dict) and "error" in data:
-        _FACTION_MEMBER_CACHE = {}
-        _FACTION_MEMBER_EXPIRES_AT = time.time() + 60
+    """
+    try:
+        data = await fetch_torn_v2("/faction/members", api_key=api_key)
+    except TornAPIError:
+        # a failed refresh keeps serving the last good map, pushed back a
+        # minute so the next attempt isn't immediate
+        item = _FACTION_MEMBER_CACHE.get_entry(faction_id)
+        _FACTION_MEMBER_CACHE.set(faction_id, item[0] if item else {}, 60)
         return
 
     members = data.get("members") or {}
     m: Dict[int, str] = {}
 
     if isinstance(members, dict):
-        for k, v in members.items():
-            try:
-                tid = int(k)
-            except Exception:
-                continue
-            if not isinstance(v, dict):
-                continue
-            name = (v.get("name") or "").strip()
-            if tid and name:
-                m[tid] = name
+        items = [(k, v) for k, v in members.items()]
+    elif isinstance(members, list):
+        items = [(v.get("id"), v) for v in members if isinstance(v, dict)]
+    else:
+        items = []
+
+    for k, v in items:
+        try:
+            tid = int(k)
+        except Exception:
+            continue
+        if not isinstance(v, dict):
+            continue
+        name = (v.get("name") or "").strip()
+        if tid and name:
+            m[tid] = name
 
-    _FACTION_MEMBER_CACHE = m
-    _FACTION_MEMBER_EXPIRES_AT = time.time() + _FACTION_MEMBER_TTL_SECONDS
+    _FACTION_MEMBER_CACHE.set(faction_id, m, _FACTION_MEMBER_TTL_SECONDS)
+    await run_db(record_names, m)
 
 
 async def _get_faction_member_map(api_key: str) -> Dict[int, str]:
-    global _FACTION_MEMBER_EXPIRES_AT
-    if time.time() >= _FACTION_MEMBER_EXPIRES_AT:
-        await _refresh_faction_members(api_key)
-    return _FACTION_MEMBER_CACHE
+    try:
+        faction_id = await faction_id_for_key(api_key)
+    except TornAPIError:
+        # not in a faction, there's no member list to read
+        return {}
+    refresh_key = ("members", faction_id)
+
+    def refresh() -> Awaitable[None]:
+        return _refresh_faction_members(api_key, faction_id)
+
+    m = _cached(_FACTION_MEMBER_CACHE, faction_id, refresh_key, refresh)
+    if m is not None:
+        return m
+    await asyncio.shield(_shared(refresh_key, refresh))
+    item = _FACTION_MEMBER_CACHE.get_entry(faction_id)
+    return item[0] if item else {}
 
 
 async def resolve_names(api_key: str, ids: Set[int], *, concurrency: int = 10) -> Dict[int, str]:
     """
-      1) faction members map (single API)
-      2) user name cache
-      3) id user basic lookup)
+      1) player_names table (one query, no API)
+      2) faction members map (single API)
+      3) user name cache
+      4) id user basic lookup)
     """
-    resolved: Dict[int, str] = {}
+    ids = {tid for tid in ids if tid > 0}
+    if not ids:
+        return {}
+    resolved: Dict[int, str] = await run_db(lookup_names, ids)
+    if len(resolved) == len(ids):
+        return resolved
 
     faction_map = await _get_faction_member_map(api_key)
     for tid in ids:
-        if tid in faction_map:
+        if tid not in resolved and tid in faction_map:
             resolved[tid] = faction_map[tid]
 
     to_fetch: list[int] = []
     for tid in ids:
-        if tid <= 0 or tid in resolved:
+        if tid in resolved:
             continue
-        cached = _user_cache_get(tid)
+        cached = _cached(_USER_NAME_CACHE, tid, ("user", tid), lambda tid=tid: _load_user_name(api_key, tid))
         if cached:
             resolved[tid] = cached
         else:
@@ -124,9 +178,8 @@ async def resolve_names(api_key: str, ids: Set[int], *, concurrency: int = 10) -
 
     async def worker(tid: int) -> None:
         async with sem:
-            name = await _fetch_user_basic_name_v1(api_key, tid)
+            name = await asyncio.shield(_shared(("user", tid), lambda: _load_user_name(api_key, tid)))
             if name:
-                _user_cache_set(tid, name)
                 resolved[tid] = name
 
     await asyncio.gather(*(worker(t) for t in to_fetch))
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, Iterable, Optional
+
+from torn_bot.db import transaction
+
+
+def record_names(names: Dict[int, str], seen_at: Optional[int] = None) -> int:
+    """
+    upserts id -> name into player_names. an older sighting never
+    overwrites a newer one, so backfilled attacks can't undo a rename
+
+    """
+    seen_at = int(seen_at if seen_at is not None else time.time())
+    rows = [
+        (int(tid), name.strip(), seen_at)
+        for tid, name in names.items()
+        if tid and isinstance(name, str) and name.strip()
+    ]
+    if not rows:
+        return 0
+    with transaction() as conn:
+        record_name_rows(conn, rows)
+    return len(rows)
+
+
+def record_name_rows(conn, rows: Iterable[tuple[int, str, int]]) -> None:
+    """
+    (torn_id, name, last_seen) rows on an open connection, for callers
+    already inside a transaction
+
+    """
+    conn.executemany(
+        """
+        INSERT INTO player_names (torn_id, name, last_seen) VALUES (?, ?, ?)
+        ON CONFLICT(torn_id) DO UPDATE SET
+            name = excluded.name,
+            last_seen = excluded.last_seen
+        WHERE excluded.last_seen >= player_names.last_seen
+        """,
+        rows,
+    )
+
+
+def lookup_names(ids: Iterable[int]) -> Dict[int, str]:
+    ids = list({int(i) for i in ids if i})
+    names: Dict[int, str] = {}
+    with transaction() as conn:
+        for chunk_start in range(0, len(ids), 500):
+            chunk = ids[chunk_start:chunk_start + 500]
+            marks = ",".join("?" * len(chunk))
+            for tid, name in conn.execute(
+                f"SELECT torn_id, name FROM player_names WHERE torn_id IN ({marks})",
+                chunk,
+            ):
+                names[int(tid)] = name
+    return names
+
+
+def seed_from_attacks() -> int:
+    """
+    fills the table from stored attacks, each id gets the name from its
+    latest attack on either side. safe to repeat, newer sightings win
+
+    """
+    total = 0
+    with transaction() as conn:
+        for side in ("attacker", "defender"):
+            total += conn.execute(
+                f"""
+                INSERT INTO player_names (torn_id, name, last_seen)
+                SELECT {side}_id, {side}_name, MAX(started) FROM faction_attacks_seen
+                WHERE {side}_id > 0 AND {side}_name IS NOT NULL AND {side}_name != ''
+                GROUP BY {side}_id
+                ON CONFLICT(torn_id) DO UPDATE SET
+                    name = excluded.name,
+                    last_seen = excluded.last_seen
+                WHERE excluded.last_seen > player_names.last_seen
+                """
+            ).rowcount
+    return total
@@ -1,10 +1,11 @@
+import functools
 import os
 import sqlite3
-from typing import Optional, List
+from typing import Any, Optional, List
 from cryptography.fernet import Fernet
 
 from torn_bot.config import ENCRYPTION_KEY, ENCRYPTION_KEY_FILE
-from torn_bot.db import init_db, get_conn
+from torn_bot.db import init_db, transaction, run_db
 
 
 GLOBAL_VIP_OWNER_ID = 0
@@ -32,140 +33,167 @@ class KeyStorage:
 
     def store_key(self, discord_id: int, api_key: str) -> None:
         encrypted = self.cipher.encrypt(api_key.encode()).decode()
-        conn = get_conn()
-        conn.execute(
-            "INSERT OR REPLACE INTO api_keys (discord_id, encrypted_key) VALUES (?, ?)",
-            (discord_id, encrypted),
-        )
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO api_keys (discord_id, encrypted_key) VALUES (?, ?)",
+                (discord_id, encrypted),
+            )
 
     def get_key(self, discord_id: int) -> Optional[str]:
-        conn = get_conn()
-        cur = conn.execute("SELECT encrypted_key FROM api_keys WHERE discord_id = ?", (discord_id,))
-        row = cur.fetchone()
-        conn.close()
+        with transaction() as conn:
+            cur = conn.execute("SELECT encrypted_key FROM api_keys WHERE discord_id = ?", (discord_id,))
+            row = cur.fetchone()
         if not row:
             return None
         return self.cipher.decrypt(row[0].encode()).decode()
 
     def delete_key(self, discord_id: int) -> bool:
-        conn = get_conn()
-        cur = conn.execute("DELETE FROM api_keys WHERE discord_id = ?", (discord_id,))
-        deleted = cur.rowcount > 0
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            cur = conn.execute("DELETE FROM api_keys WHERE discord_id = ?", (discord_id,))
+            deleted = cur.rowcount > 0
+            conn.execute("DELETE FROM key_pool WHERE discord_id = ?", (discord_id,))
         return deleted
 
+    def join_key_pool(self, discord_id: int) -> bool:
+        with transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO key_pool (discord_id) VALUES (?)",
+                (discord_id,),
+            )
+            return cur.rowcount > 0
+
+    def leave_key_pool(self, discord_id: int) -> bool:
+        with transaction() as conn:
+            cur = conn.execute("DELETE FROM key_pool WHERE discord_id = ?", (discord_id,))
+            return cur.rowcount > 0
+
+    def get_pool_keys(self) -> List[tuple[int, str]]:
+        with transaction() as conn:
+            cur = conn.execute(
+                """
+                SELECT k.discord_id, k.encrypted_key
+                FROM key_pool p JOIN api_keys k ON k.discord_id = p.discord_id
+                ORDER BY p.enrolled_at
+                """
+            )
+            rows = cur.fetchall()
+        return [(r[0], self.cipher.decrypt(r[1].encode()).decode()) for r in rows]
+
     def add_target(self, discord_id: int, torn_id: int) -> bool:
-        conn = get_conn()
         try:
-            conn.execute(
-                "INSERT INTO targets (discord_id, torn_id) VALUES (?, ?)",
-                (discord_id, torn_id),
-            )
-            conn.commit()
-            conn.close()
+            with transaction() as conn:
+                conn.execute(
+                    "INSERT INTO targets (discord_id, torn_id) VALUES (?, ?)",
+                    (discord_id, torn_id),
+                )
             return True
         except sqlite3.IntegrityError:
-            conn.close()
             return False
 
     def remove_target(self, discord_id: int, torn_id: int) -> bool:
-        conn = get_conn()
-        cur = conn.execute(
-            "DELETE FROM targets WHERE discord_id = ? AND torn_id = ?",
-            (discord_id, torn_id),
-        )
-        deleted = cur.rowcount > 0
-        conn.commit()
-        conn.close()
-        return deleted
+        with transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM targets WHERE discord_id = ? AND torn_id = ?",
+                (discord_id, torn_id),
+            )
+            return cur.rowcount > 0
 
     def get_targets(self, discord_id: int) -> List[int]:
-        conn = get_conn()
-        cur = conn.execute("SELECT torn_id FROM targets WHERE discord_id = ?", (discord_id,))
-        rows = [r[0] for r in cur.fetchall()]
-        conn.close()
-        return rows
+        with transaction() as conn:
+            cur = conn.execute("SELECT torn_id FROM targets WHERE discord_id = ?", (discord_id,))
+            return [r[0] for r in cur.fetchall()]
 
     def clear_targets(self, discord_id: int) -> int:
-        conn = get_conn()
-        cur = conn.execute("DELETE FROM targets WHERE discord_id = ?", (discord_id,))
-        count = cur.rowcount
-        conn.commit()
-        conn.close()
-        return count
+        with transaction() as conn:
+            cur = conn.execute("DELETE FROM targets WHERE discord_id = ?", (discord_id,))
+            return cur.rowcount
 
     def add_vip_target(self, torn_id: int, notes: Optional[str]) -> str:
-        conn = get_conn()
         try:
-            conn.execute(
-                "INSERT INTO vip_targets (discord_id, torn_id, notes) VALUES (?, ?, ?)",
-                (GLOBAL_VIP_OWNER_ID, torn_id, notes),
-            )
-            conn.commit()
-            conn.close()
-            return "added"
-        except sqlite3.IntegrityError:
-            if notes is not None:
+            with transaction() as conn:
                 conn.execute(
-                    "UPDATE vip_targets SET notes = ? WHERE discord_id = ? AND torn_id = ?",
-                    (notes, GLOBAL_VIP_OWNER_ID, torn_id),
+                    "INSERT INTO vip_targets (discord_id, torn_id, notes) VALUES (?, ?, ?)",
+                    (GLOBAL_VIP_OWNER_ID, torn_id, notes),
                 )
-                conn.commit()
-                conn.close()
-                return "updated"
-            conn.close()
-            return "exists"
+            return "added"
+        except sqlite3.IntegrityError:
+            if notes is None:
+                return "exists"
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE vip_targets SET notes = ? WHERE discord_id = ? AND torn_id = ?",
+                (notes, GLOBAL_VIP_OWNER_ID, torn_id),
+            )
+        return "updated"
 
     def remove_vip_target(self, torn_id: int) -> bool:
-        conn = get_conn()
-        cur = conn.execute(
-            "DELETE FROM vip_targets WHERE discord_id = ? AND torn_id = ?",
-            (GLOBAL_VIP_OWNER_ID, torn_id),
-        )
-        deleted = cur.rowcount > 0
-        conn.commit()
-        conn.close()
-        return deleted
+        with transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM vip_targets WHERE discord_id = ? AND torn_id = ?",
+                (GLOBAL_VIP_OWNER_ID, torn_id),
+            )
+            return cur.rowcount > 0
 
     def get_vip_targets(self) -> List[tuple[int, Optional[str]]]:
-        conn = get_conn()
-        cur = conn.execute(
-            "SELECT torn_id, notes FROM vip_targets WHERE discord_id = ? ORDER BY added_at",
-            (GLOBAL_VIP_OWNER_ID,),
-        )
-        rows = [(r[0], r[1]) for r in cur.fetchall()]
-        conn.close()
-        return rows
+        with transaction() as conn:
+            cur = conn.execute(
+                "SELECT torn_id, notes FROM vip_targets WHERE discord_id = ? ORDER BY added_at",
+                (GLOBAL_VIP_OWNER_ID,),
+            )
+            return [(r[0], r[1]) for r in cur.fetchall()]
 
     def store_global_key(self, name: str, api_key: str) -> None:
         encrypted = self.cipher.encrypt(api_key.encode()).decode()
-        conn = get_conn()
-        conn.execute(
-            "INSERT OR REPLACE INTO global_keys (name, encrypted_key) VALUES (?, ?)",
-            (name, encrypted),
-        )
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO global_keys (name, encrypted_key) VALUES (?, ?)",
+                (name, encrypted),
+            )
 
     def get_global_key(self, name: str) -> Optional[str]:
-        conn = get_conn()
-        cur = conn.execute(
-            "SELECT encrypted_key FROM global_keys WHERE name = ?",
-            (name,),
-        )
-        row = cur.fetchone()
-        conn.close()
+        with transaction() as conn:
+            cur = conn.execute(
+                "SELECT encrypted_key FROM global_keys WHERE name = ?",
+                (name,),
+            )
+            row = cur.fetchone()
         if not row:
             return None
         return self.cipher.decrypt(row[0].encode()).decode()
 
+    def list_global_keys(self, prefix: str) -> List[tuple[str, str]]:
+        with transaction() as conn:
+            cur = conn.execute(
+                "SELECT name, encrypted_key FROM global_keys WHERE name LIKE ? ORDER BY name",
+                (prefix + "%",),
+            )
+            rows = cur.fetchall()
+        return [(name, self.cipher.decrypt(enc.encode()).decode()) for name, enc in rows]
+
     def delete_global_key(self, name: str) -> bool:
-        conn = get_conn()
-        cur = conn.execute("DELETE FROM global_keys WHERE name = ?", (name,))
-        deleted = cur.rowcount > 0
-        conn.commit()
-        conn.close()
-        return deleted
+        with transaction() as conn:
+            cur = conn.execute("DELETE FROM global_keys WHERE name = ?", (name,))
+            return cur.rowcount > 0
+
+
+class AsyncKeyStorage:
+    """
+    KeyStorage for coroutines, every method has the same name and result
+    but is awaited and runs on the db thread
+
+    """
+
+    def __init__(self, storage: Optional[KeyStorage] = None):
+        self.sync = storage or KeyStorage()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await run_db(attr, *args, **kwargs)
+
+        setattr(self, name, call)
+        return call
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """
+    size bounded map with a per entry expiry, least recently used entries
+    are dropped first once max_size is reached
+
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get_entry(self, key: Hashable) -> Optional[tuple[Any, float]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        self._data.move_to_end(key)
+        return item
+
+    def get(self, key: Hashable) -> Any:
+        item = self.get_entry(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if time.time() >= expires_at:
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self.set_until(key, value, time.time() + ttl)
+
+    def set_until(self, key: Hashable, value: Any, expires_at: float) -> None:
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        item = self._data.pop(key, None)
+        return item[0] if item else None
+
+    def clear(self) -> None:
+        self._data.clear()